@@ -1,20 +1,65 @@
 
 import os
-import asyncio
-from datetime import datetime
 from telethon import TelegramClient, errors
 from telethon.tl.functions.channels import InviteToChannelRequest
 from telethon.tl.types import InputPeerUser
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Set
 from session_manager import SessionManager
 from login import check_session, print_header, clear_screen
 from config import API_ID, API_HASH
+from pacer import get_pacer
+from scrape import iter_participant_batches
+from runtime import get_runtime
+import log_writer
+from metrics import current_module
+from entity_cache import ResolveCache, MISSING
+from add_journal import (
+    AddJournal,
+    ADDED,
+    ALREADY_MEMBER,
+    PRIVACY_RESTRICTED,
+    NOT_MUTUAL_CONTACT,
+    TOO_MANY_CHANNELS,
+    KICKED,
+    DEACTIVATED,
+    IS_BOT,
+    NOT_FOUND,
+    ERROR
+)
 
 # Constants
-DELAY = 60  # seconds between adds
+DELAY = 60  # starting seconds between adds, adapted by the pacer
+MIN_DELAY = 20  # never add faster than this, PeerFlood is not a FloodWait
+PACE_METHOD = 'InviteToChannelRequest'
+RESOLVE_DELAY = 1  # starting seconds between username lookups
+RESOLVE_PACE_METHOD = 'ResolveUsernameRequest'  # own budget, its FloodWaits don't slow adds
 DAILY_LIMIT = 50  # Telegram's approximate daily limit
 ADD_BATCH = 10  # Users to add before showing progress
 
+# Per-user failures that retrying will not fix
+USER_FAILURES = {
+    errors.UserPrivacyRestrictedError: PRIVACY_RESTRICTED,
+    errors.UserNotMutualContactError: NOT_MUTUAL_CONTACT,
+    errors.UserChannelsTooMuchError: TOO_MANY_CHANNELS,
+    errors.UserKickedError: KICKED,
+    errors.InputUserDeactivatedError: DEACTIVATED,
+    errors.UserBotError: IS_BOT,
+    errors.UserIdInvalidError: NOT_FOUND,
+}
+
+# Of those, the ones that hold for every target group
+GLOBAL_FAILURES = {PRIVACY_RESTRICTED, NOT_MUTUAL_CONTACT, TOO_MANY_CHANNELS, DEACTIVATED, IS_BOT}
+
+# Account or group level errors: every further add would fail the same way
+STOP_ERRORS = (
+    errors.PeerFloodError,
+    errors.UserBannedInChannelError,
+    errors.ChatAdminRequiredError,
+    errors.ChatWriteForbiddenError,
+    errors.ChannelPrivateError,
+    errors.UsersTooMuchError,
+)
+
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
@@ -30,11 +75,9 @@ def print_header():
     print(header)
     print("\033[35m" + "=" * 50 + "\033[0m")
 
-def log_error(error: Exception, module: str = 'add') -> None:
-    """Log errors to add_errors.txt"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open("errors.txt", "a") as f:
-        f.write(f"[{timestamp}] {str(error)}\n")
+def log_error(error: Exception, module: str = 'add', target: str = None) -> None:
+    """Log errors to errors.txt and the JSON log"""
+    log_writer.log_error(error, module, target)
 
 async def get_credentials() -> Tuple[int, str]:
     """Get API credentials with session management"""
@@ -73,9 +116,15 @@ async def get_target_group() -> str:
     """Get target group link/ID"""
     return input("\n🎯 Enter target group link or ID: ")
 
-async def load_users(filepath: str) -> List[str]:
-    """Load usernames from file with validation"""
+async def load_users(filepath: str, group: str = None) -> List[str]:
+    """Load usernames from file with validation
+
+    With a target group, users with a final outcome in that group's add
+    journal are dropped so a re-run only spends RPCs on users still open.
+    """
     users = []
+    done = AddJournal(group).processed() if group else set()
+    skipped = 0
     try:
         print("📖 Loading users from file...")
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -85,39 +134,141 @@ async def load_users(filepath: str) -> List[str]:
                     if username.startswith('@'):
                         username = username[1:]
                     if 5 <= len(username) <= 32 and username.isalnum():
+                        if username.lower() in done:
+                            skipped += 1
+                            continue
                         users.append(username)
         print(f"✅ Loaded {len(users)} valid usernames")
+        if skipped:
+            print(f"⏭️ Skipped {skipped} users already processed for this group")
         return users
     except UnicodeDecodeError:
         print("❌ Error: File must be in UTF-8 encoding")
         return []
 
-async def add_members(client: TelegramClient, group: str, users: List[str]) -> None:
+async def resolve_user(client: TelegramClient, username: str, cache: ResolveCache):
+    """Resolve a username with get_entity and remember the outcome"""
+    try:
+        user = await client.get_entity(username)
+    except (ValueError, errors.UsernameNotOccupiedError, errors.UsernameInvalidError):
+        cache.put_missing(username)
+        return MISSING
+    return cache.put(username, user) or user
+
+async def fetch_members(client: TelegramClient, target_group) -> Tuple[Set[int], Set[str]]:
+    """Member ids and lower-cased usernames of the target group"""
+    member_ids = set()
+    member_names = set()
+    async for batch in iter_participant_batches(client, target_group):
+        for user in batch:
+            member_ids.add(user.id)
+            if user.username:
+                member_names.add(user.username.lower())
+    return member_ids, member_names
+
+def drop_existing_members(users: List[str], member_ids: Set[int], member_names: Set[str],
+                          cache: ResolveCache, journal: AddJournal) -> List[str]:
+    """Remove candidates already in the group, matched by username or cached id"""
+    remaining = []
+    for username in users:
+        cached = cache.peek(username)
+        if (username.lower() in member_names
+                or (cached and cached.user_id in member_ids)):
+            journal.record(username, ALREADY_MEMBER)
+            continue
+        remaining.append(username)
+    return remaining
+
+async def add_members(client: TelegramClient, group: str, users: List[str],
+                      cache: Optional[ResolveCache] = None,
+                      journal: Optional[AddJournal] = None) -> None:
     """Main adding function"""
+    owns_cache = cache is None
+    if owns_cache:
+        cache = ResolveCache()
+    if journal is None:
+        journal = AddJournal(group)
     try:
         print("🎯 Getting target group information...")
         target_group = await client.get_entity(group)
+
+        # One paged member fetch is far cheaper than a resolve, an invite
+        # and a full delay for every user who is already there
+        try:
+            print("👥 Checking current members of the target group...")
+            member_ids, member_names = await fetch_members(client, target_group)
+            before = len(users)
+            users = drop_existing_members(users, member_ids, member_names, cache, journal)
+            print(f"🧹 Skipped {before - len(users)} users already in the group")
+        except Exception as e:
+            log_error(e)
+            print(f"⚠️ Could not read the member list ({str(e)}), adding without pre-check")
         
         total_users = len(users)
         successful_adds = 0
+        already_members = 0
         failed_adds = 0
         
         print(f"\n🚀 Starting to add {total_users} users...")
         print("⚠️ This process will take time due to Telegram's rate limits.")
         print(f"📊 Maximum daily limit: {DAILY_LIMIT} users\n")
 
+        pacer = get_pacer()
+        pacer.configure(PACE_METHOD, DELAY, min_delay=MIN_DELAY)
+        pacer.configure(RESOLVE_PACE_METHOD, RESOLVE_DELAY)
+
         for i, username in enumerate(users, 1):
             try:
+                # Names that did not resolve before cost neither an RPC nor a slot
+                cached = cache.get(username)
+                if cached is MISSING:
+                    failed_adds += 1
+                    journal.record(username, NOT_FOUND)
+                    print(f"⏭️ Skipping {username}: not found on an earlier run")
+                    continue
+                reason = cache.unaddable_reason(username)
+                if reason:
+                    failed_adds += 1
+                    journal.record(username, reason)
+                    print(f"⏭️ Skipping {username}: {reason.replace('_', ' ')} on an earlier run")
+                    continue
+
+                user = cached
+                if user is None:
+                    await pacer.wait(RESOLVE_PACE_METHOD)
+                    try:
+                        user = await resolve_user(client, username, cache)
+                    except errors.FloodWaitError as e:
+                        failed_adds += 1
+                        print(f"\n⚠️ Lookup rate limit hit. Waiting {e.seconds} seconds...")
+                        await pacer.flood_wait(RESOLVE_PACE_METHOD, e.seconds)
+                        continue
+                    pacer.success(RESOLVE_PACE_METHOD)
+                    if user is MISSING:
+                        failed_adds += 1
+                        journal.record(username, NOT_FOUND)
+                        print(f"❌ User {username} not found")
+                        continue
+
+                # Spaces out adds, including ones that end in an error
+                await pacer.wait(PACE_METHOD)
                 print(f"👤 Adding user: {username}")
-                user = await client.get_entity(username)
                 
-                await client(InviteToChannelRequest(
+                result = await client(InviteToChannelRequest(
                     channel=target_group,
                     users=[user]
                 ))
-                
-                successful_adds += 1
-                print("✅ Success!")
+                pacer.success(PACE_METHOD)
+
+                # A real add produces updates, an existing member produces none
+                if getattr(result, 'updates', None):
+                    successful_adds += 1
+                    journal.record(username, ADDED)
+                    print("✅ Success!")
+                else:
+                    already_members += 1
+                    journal.record(username, ALREADY_MEMBER)
+                    print("ℹ️ Already a member")
                 
                 if i % ADD_BATCH == 0:
                     print(f"\n📊 Progress: {i}/{total_users} processed")
@@ -127,43 +278,64 @@ async def add_members(client: TelegramClient, group: str, users: List[str]) -> N
                     print("\n⚠️ Daily limit reached. Please try again tomorrow.")
                     break
                 
-                print(f"⏳ Waiting {DELAY} seconds...\n")
-                await asyncio.sleep(DELAY)
+                print(f"⏳ Next add in {pacer.delay(PACE_METHOD):.0f} seconds...\n")
 
             except errors.FloodWaitError as e:
                 failed_adds += 1
                 wait_time = e.seconds
                 print(f"\n⚠️ Rate limit hit. Waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
+                await pacer.flood_wait(PACE_METHOD, wait_time)
+
+            except STOP_ERRORS as e:
+                log_error(e)
+                print(f"\n🛑 {type(e).__name__}: {str(e)}")
+                print("⚠️ Every further add would fail the same way, stopping now.")
+                break
+
+            except tuple(USER_FAILURES) as e:
+                failed_adds += 1
+                outcome = USER_FAILURES[type(e)]
+                journal.record(username, outcome)
+                if outcome in GLOBAL_FAILURES:
+                    cache.put_unaddable(username, outcome)
+                print(f"❌ Error adding {username}: {outcome.replace('_', ' ')}")
 
             except Exception as e:
                 failed_adds += 1
-                log_error(e)
+                journal.record(username, ERROR, type(e).__name__)
+                log_error(e, target=username)
                 print(f"❌ Error adding {username}: {str(e)}")
-                await asyncio.sleep(DELAY)
 
-        total = successful_adds + failed_adds
+        pacer.save()
+
+        total = successful_adds + already_members + failed_adds
         success_rate = (successful_adds / total * 100) if total > 0 else 0
         
         print("\n🎉 Operation completed!")
         print(f"📊 Total processed: {total}")
         print(f"✅ Successfully added: {successful_adds}")
+        print(f"ℹ️ Already members: {already_members}")
         print(f"❌ Failed: {failed_adds}")
         print(f"📈 Success rate: {success_rate:.2f}%")
+        print(f"🗂️ Resolution cache: {cache.hits} hits, {cache.misses} resolved online")
 
     except Exception as e:
         log_error(e)
         print(f"\n❌ Error: {str(e)}")
+    finally:
+        journal.close()
+        if owns_cache:
+            cache.close()
 
 async def main_add() -> None:
     """Main adding coordinator"""
+    current_module.set('add')
     try:
         clear_screen()
         print_header()
         
         print("\n🔄 Starting Telegram session...")
-        session_mgr = SessionManager()
-        client = await session_mgr.get_client('adder_session')
+        client = await get_runtime().client('adder_session')
 
         if not client:
             print("\n❌ Failed to initialize session. Please try again.")
@@ -175,14 +347,12 @@ async def main_add() -> None:
         user_file = await get_user_file()
         target_group = await get_target_group()
 
-        users = await load_users(user_file)
+        users = await load_users(user_file, target_group)
         if not users:
             print("\n❌ No valid users found in file.")
             return
 
         await add_members(client, target_group, users)
-        
-        await client.disconnect()
 
     except Exception as e:
         log_error(e)
@@ -199,7 +369,7 @@ def start_add() -> None:
     try:
         clear_screen()
         print_header()
-        asyncio.run(main_add())
+        get_runtime().run(main_add())
     except KeyboardInterrupt:
         print("\n\n👋 Adding process cancelled by user")
     except Exception as e:
@@ -0,0 +1,88 @@
+import os
+import re
+import json
+from datetime import datetime
+from typing import Dict, Set
+
+# Constants
+ADD_JOURNAL = 'add_journal.jsonl'
+
+# Per-user outcomes
+ADDED = 'added'
+ALREADY_MEMBER = 'already_member'
+PRIVACY_RESTRICTED = 'privacy_restricted'
+NOT_MUTUAL_CONTACT = 'not_mutual_contact'
+TOO_MANY_CHANNELS = 'too_many_channels'
+KICKED = 'kicked'
+DEACTIVATED = 'deactivated'
+IS_BOT = 'bot'
+NOT_FOUND = 'not_found'
+ERROR = 'error'
+
+# Outcomes a re-run cannot change; anything else, e.g. ERROR, is tried again
+FINAL_OUTCOMES = frozenset({
+    ADDED, ALREADY_MEMBER, PRIVACY_RESTRICTED, NOT_MUTUAL_CONTACT,
+    TOO_MANY_CHANNELS, KICKED, DEACTIVATED, IS_BOT, NOT_FOUND,
+})
+
+
+def group_key(group: str) -> str:
+    """Normalize a group link/username/ID so every spelling maps to one key"""
+    key = group.strip().lower()
+    key = re.sub(r'^(https?://)?(t\.me|telegram\.me)/', '', key)
+    return key.strip('/').lstrip('@')
+
+
+class AddJournal:
+    """Append-only log of add outcomes per target group
+
+    One JSON line per user that add_members actually tried. Re-runs read
+    it back and drop users with a final outcome before spending any RPC
+    on them; users that only failed with an error are tried again.
+    """
+
+    def __init__(self, group: str, path: str = ADD_JOURNAL):
+        self.group = group_key(group)
+        self.path = path
+        self._file = None
+
+    def outcomes(self) -> Dict[str, str]:
+        """Last recorded outcome per username for this group"""
+        outcomes = {}
+        if not os.path.exists(self.path):
+            return outcomes
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A torn last line from a crash
+                if entry.get('group') == self.group:
+                    outcomes[entry['user'].lower()] = entry['outcome']
+        return outcomes
+
+    def processed(self) -> Set[str]:
+        """Lower-cased usernames whose last outcome for this group is final"""
+        return {user for user, outcome in self.outcomes().items()
+                if outcome in FINAL_OUTCOMES}
+
+    def record(self, username: str, outcome: str, detail: str = None) -> None:
+        """Append one outcome and flush it to disk"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        entry = {
+            'ts': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'group': self.group,
+            'user': username,
+            'outcome': outcome,
+        }
+        if detail:
+            entry['detail'] = detail
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
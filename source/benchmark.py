@@ -0,0 +1,304 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from typing import Dict, List, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CASES = ('scrape', 'rescrape', 'add', 'post')
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class ScaledClock:
+    """Patch asyncio.sleep so benchmark sleeps run at a fraction of real time"""
+
+    def __init__(self, scale: float):
+        self.scale = scale
+        self.slept = 0.0  # simulated seconds skipped by scaling, not CPU time
+        self._sleep = asyncio.sleep
+        self._start = time.monotonic()
+
+    def now(self) -> float:
+        """Simulated seconds since start, as if sleeps ran in real time"""
+        return time.monotonic() - self._start + self.slept
+
+    def install(self) -> None:
+        original = self._sleep
+
+        async def scaled_sleep(delay, result=None):
+            delay = max(delay, 0)
+            wake_at = self.now() + delay
+            result = await original(delay * self.scale, result)
+            # Overlapping sleeps of concurrent tasks only advance time once
+            self.slept += max(0.0, wake_at - self.now())
+            return result
+
+        asyncio.sleep = scaled_sleep
+
+
+def prepare_workdir() -> str:
+    """Create a throwaway working dir with dummy credentials"""
+    workdir = tempfile.mkdtemp(prefix='telety_bench_')
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump({
+            "api_id": 1,
+            "api_hash": "bench",
+            "session_files": {
+                "scraper_session": "scraper_session",
+                "adder_session": "adder_session"
+            }
+        }, f)
+    return workdir
+
+
+async def bench_scrape(client, size: int) -> int:
+    from fake_client import FakeGroup, GROUP_ID_BASE
+    import scrape
+
+    client.add_group(FakeGroup(GROUP_ID_BASE, size, username='benchgroup'))
+    await scrape.scrape_users(client, 'benchgroup')
+    return size
+
+
+async def setup_rescrape(client, size: int) -> None:
+    from fake_client import FakeGroup, GROUP_ID_BASE, USER_ID_BASE
+    import scrape
+    from member_store import MemberStore
+
+    group = FakeGroup(GROUP_ID_BASE, size, username='benchgroup')
+    client.add_group(group)
+    store = MemberStore()
+    await scrape.rescrape_users(client, 'benchgroup', store)
+    store.close()
+
+    # About 1% churn at the tail of the member list
+    churn = max(1, size // 100)
+    for i in range(churn):
+        group.remove_member(USER_ID_BASE + size - 1 - i)
+    for i in range(churn):
+        group.add_member(USER_ID_BASE + size + i)
+
+
+async def bench_rescrape(client, size: int) -> int:
+    import scrape
+    from member_store import MemberStore
+
+    store = MemberStore()
+    await scrape.rescrape_users(client, 'benchgroup', store)
+    store.close()
+    return size
+
+
+async def bench_add(client, size: int) -> int:
+    from fake_client import FakeGroup, GROUP_ID_BASE
+    import add
+
+    # Half of the candidate list is already in the target group
+    client.add_group(FakeGroup(GROUP_ID_BASE, size // 2, username='benchtarget'))
+    users = [f"user{1_000_000 + i}" for i in range(size)]
+    await add.add_members(client, 'benchtarget', users)
+    return size
+
+
+async def bench_post(client, size: int) -> int:
+    from fake_client import FakeGroup, GROUP_ID_BASE, SELF_ID
+    import post
+    from broadcast import BroadcastScheduler
+    from telethon import utils
+
+    client.is_bot = True
+    bot = post.PostBot()
+    bot.client = client
+    bot.scheduler = BroadcastScheduler(clock=client.clock)
+    for i in range(size):
+        group = FakeGroup(GROUP_ID_BASE + i, 10)
+        client.add_group(group)
+        bot.target_groups.add(utils.get_peer_id(group.entity()), group.title)
+    bot.setup_handlers()
+
+    await client.emit_message("Benchmark broadcast", sender_id=SELF_ID)
+    await client.emit_message("/post", sender_id=SELF_ID)
+    # /post hands the broadcast to a background job
+    await bot.active_job.task
+    return size
+
+
+BENCHES = {
+    'scrape': bench_scrape,
+    'rescrape': bench_rescrape,
+    'add': bench_add,
+    'post': bench_post,
+}
+
+# Untimed work a case needs first, e.g. the baseline for a re-scrape
+SETUPS = {
+    'rescrape': setup_rescrape,
+}
+
+
+def run_case(args) -> Dict:
+    """Run one benchmark case in this process and return its metrics"""
+    workdir = prepare_workdir()
+    os.chdir(workdir)
+    sys.path.insert(0, SCRIPT_DIR)
+
+    clock = ScaledClock(args.time_scale)
+    clock.install()
+
+    # Pace against simulated time
+    import pacer
+    pacer.get_pacer().clock = clock.now
+
+    from fake_client import FakeTelegramClient
+    client = FakeTelegramClient(
+        latency=args.latency,
+        flood_every=args.flood_every,
+        flood_seconds=args.flood_seconds,
+        privacy_every=args.privacy_every,
+        peer_flood_after=args.peer_flood_after,
+        rate_limits=parse_rate_limits(args.rate_limit),
+        clock=clock.now
+    )
+
+    async def runner():
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+            if args.case in SETUPS:
+                await SETUPS[args.case](client, args.size)
+                client.rpc_counts.clear()
+                client.flood_waits = 0
+            slept_before = clock.slept
+            start = time.perf_counter()
+            items = await BENCHES[args.case](client, args.size)
+        return items, time.perf_counter() - start, clock.slept - slept_before
+
+    items, wall, slept = asyncio.run(runner())
+    # Time the run would have taken with real sleeps
+    simulated = wall + slept
+    return {
+        'case': args.case,
+        'size': args.size,
+        'wall_s': round(wall, 3),
+        'simulated_s': round(simulated, 3),
+        'slept_s': round(slept, 3),
+        'rpc': client.rpc_total,
+        'rpc_by_method': dict(client.rpc_counts),
+        'flood_waits': client.flood_waits,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'throughput': round(items / simulated, 2) if simulated > 0 else 0.0,
+        'workdir': workdir,
+    }
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_rate_limits(values: List[str]) -> Dict[str, Tuple[int, float]]:
+    """Parse METHOD=CALLS/SECONDS specs, e.g. ResolveUsernameRequest=5/60"""
+    limits = {}
+    for spec in values or []:
+        method, _, rate = spec.partition('=')
+        calls, _, period = rate.partition('/')
+        limits[method] = (int(calls), float(period))
+    return limits
+
+
+def print_table(results: List[Dict]) -> None:
+    print("\n📊 Benchmark results (simulated = wall time with real sleeps)\n")
+    print(f"{'case':<8}{'size':>9}{'wall s':>10}{'sim s':>12}{'rpc':>9}"
+          f"{'flood':>7}{'rss MB':>9}{'items/s':>11}")
+    print("\033[35m" + "-" * 75 + "\033[0m")
+    for r in results:
+        print(f"{r['case']:<8}{r['size']:>9}{r['wall_s']:>10}{r['simulated_s']:>12}"
+              f"{r['rpc']:>9}{r['flood_waits']:>7}{r['peak_rss_mb']:>9}{r['throughput']:>11}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline Telety benchmarks")
+    parser.add_argument('cases', nargs='*', help=f"any of {', '.join(CASES)} (default: all)")
+    parser.add_argument('--members', default='1000,50000', help="scrape/rescrape group sizes")
+    parser.add_argument('--users', default='200', help="add candidate list sizes")
+    parser.add_argument('--groups', default='50,500', help="post target group counts")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per RPC")
+    parser.add_argument('--flood-every', type=int, default=0, help="FloodWait every N RPCs")
+    parser.add_argument('--flood-seconds', type=int, default=5)
+    parser.add_argument('--privacy-every', type=int, default=0,
+                        help="privacy-restrict every Nth user on invite")
+    parser.add_argument('--peer-flood-after', type=int, default=0,
+                        help="answer invites with PeerFlood after N of them")
+    parser.add_argument('--rate-limit', action='append', metavar='METHOD=CALLS/SECONDS',
+                        help="server-side rate limit that answers with FloodWait")
+    parser.add_argument('--time-scale', type=float, default=0.001,
+                        help="fraction of real time spent in sleeps")
+    parser.add_argument('--json', action='store_true', help="print raw JSON lines")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child mode: one case per process so peak RSS is not shared
+    if args.case:
+        print(json.dumps(run_case(args)))
+        return
+
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    cases = args.cases or list(CASES)
+
+    sizes = {
+        'scrape': parse_sizes(args.members),
+        'rescrape': parse_sizes(args.members),
+        'add': parse_sizes(args.users),
+        'post': parse_sizes(args.groups),
+    }
+    passthrough = [
+        '--latency', str(args.latency),
+        '--flood-every', str(args.flood_every),
+        '--flood-seconds', str(args.flood_seconds),
+        '--privacy-every', str(args.privacy_every),
+        '--peer-flood-after', str(args.peer_flood_after),
+        '--time-scale', str(args.time_scale),
+    ]
+    for spec in args.rate_limit or []:
+        passthrough += ['--rate-limit', spec]
+
+    results = []
+    for case in cases:
+        for size in sizes[case]:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__),
+                 '--case', case, '--size', str(size)] + passthrough,
+                capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"❌ {case} ({size}) failed:\n{proc.stderr}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            if args.json:
+                print(json.dumps(result))
+
+    if not args.json:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
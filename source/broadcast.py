@@ -0,0 +1,205 @@
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from telethon.errors import FloodWaitError
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Constants
+GLOBAL_RATE = 25  # messages per second overall, under the Bot API limit of about 30
+GLOBAL_BURST = 1  # no bursting past the global rate
+CHAT_RATE = 20 / 60  # messages per second a bot may send into one group
+CHAT_BURST = 1
+MAX_IN_FLIGHT = 16  # concurrent sends
+MAX_RETRIES = 3  # FloodWaits tolerated per chat before giving up on it
+RETRY_DELAY = 30  # seconds before a chat that failed transiently is tried again
+
+
+class RetryLater(Exception):
+    """Raised by a send that failed transiently, to have its chat retried"""
+
+    def __init__(self, reason: str, seconds: float = RETRY_DELAY):
+        super().__init__(reason)
+        self.seconds = seconds
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of polling
+
+    ``reserve`` always takes a token, letting the balance go negative,
+    and returns how long the caller has to wait before using it. Callers
+    that reserve together are therefore spaced out at ``rate``.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block(self, now: float, seconds: float) -> None:
+        """Hold back new tokens for ``seconds``, e.g. after a FloodWait"""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+        self.updated = now
+
+
+class BroadcastJob:
+    """Live progress of one broadcast, kept in memory for /status"""
+
+    __slots__ = ('job_id', 'owner', 'total', 'sent', 'failed', 'started', 'finished',
+                 'cancelled', 'task', 'clock')
+
+    def __init__(self, job_id: int, total: int = 0, clock=time.monotonic,
+                 owner: Optional[int] = None):
+        self.job_id = job_id
+        self.owner = owner  # user who started it and may cancel it
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.clock = clock
+        self.started = clock()
+        self.finished: Optional[float] = None
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return max(0, self.total - self.sent - self.failed)
+
+    @property
+    def running(self) -> bool:
+        return self.finished is None
+
+    def record(self, delivered: bool) -> None:
+        if delivered:
+            self.sent += 1
+        else:
+            self.failed += 1
+
+    def finish(self) -> None:
+        self.finished = self.clock()
+
+    def throughput(self) -> float:
+        """Groups handled per second so far"""
+        elapsed = (self.finished or self.clock()) - self.started
+        return (self.sent + self.failed) / elapsed if elapsed > 0 else 0.0
+
+
+class BroadcastScheduler:
+    """Fan one message out to many chats within Telegram's bot limits
+
+    Sends run concurrently up to ``max_in_flight``, paced by one global
+    bucket and one bucket per chat. A FloodWait only holds back the chat
+    it was raised for; that chat is re-queued after the requested wait
+    while the other chats keep going. Per-chat buckets outlive a single
+    broadcast, so back-to-back posts to the same group stay paced too.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 max_in_flight: int = MAX_IN_FLIGHT, clock=time.monotonic):
+        self.chat_rate = chat_rate
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, GLOBAL_BURST, clock())
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.flood_waits = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, CHAT_BURST, self.clock())
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def hold(self, chat_id: int, seconds: float) -> None:
+        """Keep a chat back for ``seconds``, e.g. a FloodWait from an earlier run"""
+        if seconds > 0:
+            self._chat_bucket(chat_id).block(self.clock(), seconds)
+
+    async def _wait(self, bucket: TokenBucket) -> None:
+        delay = bucket.reserve(self.clock())
+        if delay > 0:
+            get_metrics().record_sleep('rate_limit', delay)
+            await asyncio.sleep(delay)
+
+    async def run(self, chat_ids: Iterable[int],
+                  send: Callable[[int], Awaitable[bool]],
+                  on_result: Optional[Callable[[int, bool], None]] = None) -> Dict[int, bool]:
+        """Call ``send(chat_id)`` once per chat, returns chat id -> delivered
+
+        ``send`` returns False for a failed delivery and raises
+        FloodWaitError or RetryLater to have the chat retried later.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait((chat_id, 0))
+        results: Dict[int, bool] = {}
+        retries = set()
+        get_metrics().gauge('telety_queue_depth', queue.qsize, queue='broadcast')
+
+        def finish(chat_id: int, delivered: bool) -> None:
+            results[chat_id] = delivered
+            if on_result:
+                try:
+                    on_result(chat_id, delivered)
+                except Exception as e:
+                    # A broken callback must not take the worker down with it
+                    logger.error(f"Result callback for chat {chat_id} failed: {e}")
+
+        async def requeue(chat_id: int, attempt: int, seconds: float) -> None:
+            try:
+                await asyncio.sleep(seconds)
+                queue.put_nowait((chat_id, attempt))
+            finally:
+                # Only now is the original item done, so join() keeps waiting
+                queue.task_done()
+
+        async def worker() -> None:
+            while True:
+                chat_id, attempt = await queue.get()
+                retried = False
+                try:
+                    chat_bucket = self._chat_bucket(chat_id)
+                    await self._wait(chat_bucket)
+                    await self._wait(self.global_bucket)
+                    finish(chat_id, await send(chat_id))
+                except (FloodWaitError, RetryLater) as e:
+                    if isinstance(e, FloodWaitError):
+                        self.flood_waits += 1
+                    chat_bucket.block(self.clock(), e.seconds)
+                    if attempt < MAX_RETRIES:
+                        logger.warning(f"{e} for chat {chat_id}, re-queued in {e.seconds}s")
+                        task = asyncio.ensure_future(requeue(chat_id, attempt + 1, e.seconds))
+                        retries.add(task)
+                        task.add_done_callback(retries.discard)
+                        retried = True
+                    else:
+                        finish(chat_id, False)
+                except Exception as e:
+                    logger.error(f"Send to chat {chat_id} failed: {e}")
+                    finish(chat_id, False)
+                finally:
+                    if not retried:
+                        queue.task_done()
+
+        workers = [asyncio.ensure_future(worker())
+                   for _ in range(max(1, min(self.max_in_flight, queue.qsize())))]
+        try:
+            await queue.join()
+        finally:
+            for task in workers + list(retries):
+                task.cancel()
+            await asyncio.gather(*workers, *retries, return_exceptions=True)
+            get_metrics().remove_gauge('telety_queue_depth', queue='broadcast')
+        return results
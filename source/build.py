@@ -41,7 +41,22 @@ def copy_required_files(build_dir):
         'login.py',
         'post.py',
         'scrape.py',
-        'session_manager.py'
+        'session_manager.py',
+        'export.py',
+        'checkpoint.py',
+        'pacer.py',
+        'member_store.py',
+        'entity_cache.py',
+        'add_journal.py',
+        'broadcast.py',
+        'outbox.py',
+        'group_registry.py',
+        'drafts.py',
+        'runtime.py',
+        'session_store.py',
+        'daemon.py',
+        'log_writer.py',
+        'metrics.py'
     ]
     
     print("📁 Copying source files...")
@@ -67,7 +82,8 @@ a = Analysis(
         'asyncio',
         'logging',
         'json',
-        'datetime'
+        'datetime',
+        'sqlite3'
     ],
     hookspath=[],
     hooksconfig={{}},
@@ -0,0 +1,100 @@
+import os
+import re
+import json
+import glob
+from datetime import datetime
+from typing import List, Optional
+
+# Constants
+CHECKPOINT_DIR = 'checkpoints'
+
+
+class ScrapeCheckpoint:
+    """Committed progress of one scrape, keyed by (session, group)
+
+    Written atomically after every batch that reached the spool file, so a
+    resumed scrape continues from the last committed offset and never
+    re-requests pages it already paid for.
+    """
+
+    def __init__(self, session_name: str, group_name: str):
+        self.session_name = session_name
+        self.group_name = group_name
+        safe_group = re.sub(r'[^\w-]', '_', str(group_name))
+        self.path = os.path.join(CHECKPOINT_DIR, f"scrape_{session_name}_{safe_group}.json")
+        self.group = None  # Link/ID as originally entered
+        self.filename = None
+        self.offset = 0
+        self.batches = 0
+        self.written = 0
+        self.spool_size = 0
+        self.total_attempts = 0
+        self.failed_attempts = 0
+        self.updated = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> bool:
+        """Load the checkpoint from disk, returns False if there is none"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for key, value in data.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+        return True
+
+    def commit(self, **progress) -> None:
+        """Update progress fields and atomically write the checkpoint"""
+        for key, value in progress.items():
+            setattr(self, key, value)
+        self.updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        data = {
+            'session_name': self.session_name,
+            'group_name': self.group_name,
+            'group': self.group,
+            'filename': self.filename,
+            'offset': self.offset,
+            'batches': self.batches,
+            'written': self.written,
+            'spool_size': self.spool_size,
+            'total_attempts': self.total_attempts,
+            'failed_attempts': self.failed_attempts,
+            'updated': self.updated,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @classmethod
+    def pending(cls, session_name: str) -> List['ScrapeCheckpoint']:
+        """All unfinished scrapes for a session, most recent first"""
+        checkpoints = []
+        pattern = os.path.join(CHECKPOINT_DIR, f"scrape_{session_name}_*.json")
+        for path in glob.glob(pattern):
+            checkpoint = cls.from_file(path)
+            if checkpoint:
+                checkpoints.append(checkpoint)
+        return sorted(checkpoints, key=lambda c: c.updated or '', reverse=True)
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional['ScrapeCheckpoint']:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            checkpoint = cls(data['session_name'], data['group_name'])
+        except (OSError, ValueError, KeyError):
+            return None
+        return checkpoint if checkpoint.load() else None
@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from login import check_session
+from runtime import get_runtime
+import log_writer
+from metrics import current_module, get_metrics, start_metrics
+
+# Constants
+SOCKET_PATH = 'telety.sock'
+JOBS_PER_SESSION = 1  # jobs running at once on one Telegram session
+JOB_HISTORY = 200  # finished jobs kept for status queries
+MAX_REQUEST = 64 * 1024  # bytes accepted per request line
+
+# Job type -> session it runs on
+JOB_SESSIONS = {
+    'scrape': 'scraper_session',
+    'add': 'adder_session',
+    'post': 'bot_session',
+}
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def log_error(error: Exception, target: object = None) -> None:
+    """Log errors to errors.txt and the JSON log"""
+    log_writer.log_error(error, 'daemon', target)
+
+
+class DaemonJob:
+    """One submitted job and its progress"""
+
+    __slots__ = ('job_id', 'kind', 'params', 'status', 'error', 'result',
+                 'submitted', 'started', 'finished', 'task')
+
+    def __init__(self, job_id: int, kind: str, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'type': self.kind,
+            'status': self.status,
+            'error': self.error,
+            'result': self.result,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class Daemon:
+    """Runs scrape, add and post jobs sent as JSON over a UNIX socket
+
+    Each request is one JSON object on one line, answered by one line:
+
+        {"action": "submit", "type": "scrape", "groups": ["@group"]}
+        {"action": "submit", "type": "add", "user_file": "users.txt", "target_group": "@group"}
+        {"action": "submit", "type": "post", "text": "Hello"}
+        {"action": "status"}  or  {"action": "status", "job_id": 3}
+        {"action": "cancel", "job_id": 3}
+        {"action": "shutdown"}
+
+    Jobs wait in one queue per session and run at most ``jobs_per_session``
+    at a time on it. Clients come from the shared runtime, so they stay
+    connected from one job to the next.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH, bot_token: Optional[str] = None,
+                 jobs_per_session: int = JOBS_PER_SESSION):
+        self.socket_path = socket_path
+        self.bot_token = bot_token
+        self.jobs_per_session = jobs_per_session
+        self.jobs: 'OrderedDict[int, DaemonJob]' = OrderedDict()
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers = []
+        self.next_id = 1
+        self.post_bot = None
+        self.stopped: Optional[asyncio.Event] = None
+
+    # --- jobs -------------------------------------------------------------
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> DaemonJob:
+        session = JOB_SESSIONS.get(kind)
+        if session is None:
+            raise ValueError(f"unknown job type {kind!r}, expected one of {', '.join(JOB_SESSIONS)}")
+        self._validate(kind, params)
+
+        job = DaemonJob(self.next_id, kind, params)
+        self.next_id += 1
+        self.jobs[job.job_id] = job
+        self._queue(session).put_nowait(job)
+        self._trim_history()
+        return job
+
+    @staticmethod
+    def _validate(kind: str, params: Dict[str, Any]) -> None:
+        if kind == 'scrape':
+            groups = params.get('groups')
+            if not groups or not isinstance(groups, list):
+                raise ValueError("scrape needs a non-empty 'groups' list")
+        elif kind == 'add':
+            if not params.get('user_file') or not params.get('target_group'):
+                raise ValueError("add needs 'user_file' and 'target_group'")
+        elif kind == 'post':
+            if not params.get('text'):
+                raise ValueError("post needs 'text'")
+
+    def _queue(self, session: str) -> asyncio.Queue:
+        queue = self.queues.get(session)
+        if queue is None:
+            queue = self.queues[session] = asyncio.Queue()
+            get_metrics().gauge('telety_queue_depth', queue.qsize, queue=f'daemon_{session}')
+            self.workers.extend(asyncio.ensure_future(self._worker(queue))
+                                for _ in range(self.jobs_per_session))
+        return queue
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job = await queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue  # Cancelled while waiting
+                job.status = RUNNING
+                job.started = time.time()
+                job.task = asyncio.ensure_future(self._run(job))
+                try:
+                    job.result = await job.task
+                    job.status = DONE
+                except asyncio.CancelledError:
+                    if job.status != CANCELLED:
+                        raise  # The daemon itself is stopping
+                except Exception as e:
+                    log_error(e, target=f"job {job.job_id}")
+                    job.status = FAILED
+                    job.error = str(e)
+                finally:
+                    job.finished = time.time()
+                    print(f"{'✅' if job.status == DONE else '❌'} Job #{job.job_id} "
+                          f"({job.kind}) {job.status}")
+            finally:
+                queue.task_done()
+
+    def cancel(self, job_id: int) -> DaemonJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"no job {job_id}")
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.finished = time.time()
+        elif job.status == RUNNING:
+            job.status = CANCELLED
+            job.task.cancel()
+        return job
+
+    async def _run(self, job: DaemonJob) -> Optional[Dict[str, Any]]:
+        current_module.set(job.kind)
+        params = job.params
+        if job.kind == 'scrape':
+            from scrape import run_scrape
+            client = await self._client('scraper_session')
+            await run_scrape(client, params['groups'], bool(params.get('resume', False)),
+                             save_db=bool(params.get('save_db', False)),
+                             incremental=bool(params.get('incremental', False)))
+            return None
+
+        if job.kind == 'add':
+            from add import load_users, add_members
+            client = await self._client('adder_session')
+            users = await load_users(params['user_file'], params['target_group'])
+            if users:
+                await add_members(client, params['target_group'], users)
+            return {'users': len(users)}
+
+        bot = await self._post_bot(params.get('bot_token'))
+        while bot.busy:
+            # A /post from Telegram or a resumed job is still going, wait for it
+            await asyncio.wait([bot.active_job.task if bot.active_job else bot.resuming])
+        broadcast = bot.broadcast_text(params['text'])
+        try:
+            await asyncio.shield(broadcast.task)
+        except asyncio.CancelledError:
+            # A cancelled job is closed; on shutdown the bot resumes it next time
+            broadcast.cancelled = job.status == CANCELLED
+            broadcast.task.cancel()
+            await asyncio.wait([broadcast.task])
+            raise
+        return bot.outbox.counts(broadcast.job_id)
+
+    async def _client(self, session_name: str):
+        client = await get_runtime().client(session_name)
+        if client is None:
+            raise RuntimeError(f"could not connect {session_name}, log in from the menu first")
+        return client
+
+    async def _post_bot(self, bot_token: Optional[str]):
+        """The posting bot, started on the first post job and kept running"""
+        if self.post_bot is None:
+            from post import PostBot
+            bot_token = bot_token or self.bot_token
+            if not bot_token:
+                raise RuntimeError("post needs a 'bot_token' or a daemon started with --bot-token")
+            bot = PostBot()
+            if not await bot.initialize_client(bot_token):
+                raise RuntimeError("bot login failed")
+            bot.setup_handlers()
+            self.post_bot = bot
+            self.workers.append(asyncio.ensure_future(bot.verify_saved_groups()))
+            self.workers.append(bot.start_resume())
+        return self.post_bot
+
+    # --- socket -----------------------------------------------------------
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one request"""
+        action = request.get('action')
+        if action == 'submit':
+            params = {k: v for k, v in request.items() if k not in ('action', 'type')}
+            job = self.submit(request.get('type'), params)
+            return {'ok': True, 'job_id': job.job_id, 'status': job.status}
+        if action == 'status':
+            if 'job_id' in request:
+                job = self.jobs.get(request['job_id'])
+                if job is None:
+                    raise ValueError(f"no job {request['job_id']}")
+                return {'ok': True, 'job': job.to_dict()}
+            return {'ok': True, 'jobs': [job.to_dict() for job in self.jobs.values()]}
+        if action == 'cancel':
+            job = self.cancel(request.get('job_id'))
+            return {'ok': True, 'job': job.to_dict()}
+        if action == 'shutdown':
+            self.stopped.set()
+            return {'ok': True}
+        raise ValueError(f"unknown action {action!r}")
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                    reply = self.handle(request)
+                except (ValueError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            # ValueError: a request line longer than MAX_REQUEST
+            log_error(e)
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        if not hasattr(asyncio, 'start_unix_server'):
+            raise RuntimeError("daemon mode needs UNIX domain sockets")
+        self.stopped = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left over from a daemon that was killed
+        server = await asyncio.start_unix_server(self._serve_connection, path=self.socket_path,
+                                                 limit=MAX_REQUEST)
+        os.chmod(self.socket_path, 0o600)  # Jobs run with this account, keep it private
+        print(f"🚀 Telety daemon listening on {self.socket_path}")
+        print("💡 Send {\"action\": \"shutdown\"} or press Ctrl+C to stop")
+        try:
+            await self.stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            await self.stop()
+
+    async def stop(self) -> None:
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        tasks = self.workers + [job.task for job in self.jobs.values() if job.task]
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.post_bot and self.post_bot.client:
+            await self.post_bot.client.disconnect()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        print("\n✨ Telety daemon stopped")
+
+
+def send_request(request: Dict[str, Any], socket_path: str = SOCKET_PATH) -> Dict[str, Any]:
+    """Send one request to a running daemon and return its reply"""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        reply = sock.makefile('rb').readline()
+    return json.loads(reply)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Telety jobs headless")
+    parser.add_argument('--socket', default=SOCKET_PATH, help="control socket path")
+    parser.add_argument('--bot-token', default=os.environ.get('TELETY_BOT_TOKEN'),
+                        help="token for post jobs (default: $TELETY_BOT_TOKEN)")
+    parser.add_argument('--jobs-per-session', type=int, default=JOBS_PER_SESSION)
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve Prometheus metrics on localhost (default: $TELETY_METRICS_PORT)")
+    parser.add_argument('--send', metavar='JSON',
+                        help="send one request to a running daemon and print the reply")
+    args = parser.parse_args()
+
+    if args.send:
+        print(json.dumps(send_request(json.loads(args.send), args.socket), indent=2))
+        return
+
+    if not check_session():
+        print("\n❌ Error: Please login first!")
+        sys.exit(1)
+
+    log_writer.setup_logging()
+    start_metrics(args.metrics_port)
+    daemon = Daemon(args.socket, args.bot_token, max(1, args.jobs_per_session))
+    try:
+        get_runtime().run(daemon.serve())
+    except KeyboardInterrupt:
+        print("\n\n👋 Received shutdown signal...")
+
+
+if __name__ == "__main__":
+    main()
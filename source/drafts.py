@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from telethon import utils
+from telethon.tl.types import MessageMediaWebPage
+
+# Constants
+ALBUM_LIMIT = 10  # items Telegram allows in one album
+DRAFT_LIMIT = 1000  # drafts kept at most, least recently used go first
+DRAFT_TTL = 24 * 3600  # seconds a draft is kept without being touched
+
+
+class Draft:
+    """What /post needs from a stored message, without the Message object
+
+    ``media`` is already an InputMedia, so every group send reuses it
+    instead of converting the original media again. An album keeps one
+    (InputMedia, caption, entities) tuple per item in ``album``.
+    """
+
+    __slots__ = ('peer', 'message_id', 'text', 'entities', 'media', 'album', 'touched')
+
+    def __init__(self, peer: int, message_id: int, text: str = '',
+                 entities=None, media=None, album: tuple = None):
+        self.peer = peer
+        self.message_id = message_id
+        self.text = text
+        self.entities = entities
+        self.media = media
+        self.album = album
+        self.touched = time.monotonic()
+
+    @classmethod
+    def from_message(cls, message) -> 'Draft':
+        return cls(message.chat_id, message.id, message.message or '',
+                   message.entities, _input_media(message))
+
+    @classmethod
+    def from_album(cls, messages: List) -> 'Draft':
+        """One draft for all items of an album, sent later as a single request"""
+        messages = sorted(messages, key=lambda m: m.id)[:ALBUM_LIMIT]
+        album = []
+        for m in messages:
+            media = _input_media(m)
+            if media is not None:
+                album.append((media, m.message or '', m.entities))
+        first = messages[0]
+        caption = next((m.message for m in messages if m.message), '')
+        return cls(first.chat_id, first.id, caption, album=tuple(album))
+
+    @property
+    def empty(self) -> bool:
+        return not self.text and self.media is None and not self.album
+
+
+def _input_media(message):
+    media = message.media
+    if media is None or isinstance(media, MessageMediaWebPage):
+        return None  # Link previews are regenerated from the text
+    return utils.get_input_media(media)
+
+
+class DraftStore:
+    """Per-user drafts, bounded in count and age"""
+
+    def __init__(self, limit: int = DRAFT_LIMIT, ttl: float = DRAFT_TTL):
+        self.limit = limit
+        self.ttl = ttl
+        self._drafts: 'OrderedDict[int, Draft]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    def _expire(self, now: float) -> None:
+        while self._drafts:
+            user_id, draft = next(iter(self._drafts.items()))
+            if now - draft.touched < self.ttl:
+                break
+            del self._drafts[user_id]
+
+    def put(self, user_id: int, draft: Draft) -> None:
+        self._expire(draft.touched)
+        self._drafts[user_id] = draft
+        self._drafts.move_to_end(user_id)
+        while len(self._drafts) > self.limit:
+            self._drafts.popitem(last=False)
+
+    def get(self, user_id: int) -> Optional[Draft]:
+        now = time.monotonic()
+        self._expire(now)
+        draft = self._drafts.get(user_id)
+        if draft is not None:
+            draft.touched = now
+            self._drafts.move_to_end(user_id)
+        return draft
+
+    def pop(self, user_id: int) -> Optional[Draft]:
+        self._expire(time.monotonic())
+        return self._drafts.pop(user_id, None)
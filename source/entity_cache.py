@@ -0,0 +1,148 @@
+import time
+import sqlite3
+from typing import Optional, Union
+from telethon.tl.types import InputPeerUser
+
+# Constants
+ENTITY_CACHE_DB = 'entity_cache.db'
+RESOLVED_TTL = 7 * 24 * 3600  # seconds a resolved username stays valid
+MISSING_TTL = 24 * 3600  # seconds a username is remembered as not existing
+UNADDABLE_TTL = 30 * 24 * 3600  # seconds a user is remembered as impossible to add
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolved (
+    username    TEXT PRIMARY KEY COLLATE NOCASE,
+    user_id     INTEGER NOT NULL,
+    access_hash INTEGER NOT NULL,
+    resolved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resolved_at ON resolved(resolved_at);
+
+CREATE TABLE IF NOT EXISTS missing (
+    username   TEXT PRIMARY KEY COLLATE NOCASE,
+    checked_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS unaddable (
+    username  TEXT PRIMARY KEY COLLATE NOCASE,
+    reason    TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class _Missing:
+    """Marker for a username cached as not existing"""
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+class ResolveCache:
+    """Persistent username -> (id, access_hash) cache
+
+    Saves the contacts.ResolveUsername RPC that ``get_entity(username)``
+    costs for every user that was resolved on an earlier run. Names that
+    did not resolve are cached negatively so they are not retried either.
+    """
+
+    def __init__(self, path: str = ENTITY_CACHE_DB, resolved_ttl: float = RESOLVED_TTL,
+                 missing_ttl: float = MISSING_TTL):
+        self.resolved_ttl = resolved_ttl
+        self.missing_ttl = missing_ttl
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.evict_expired()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def evict_expired(self) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM resolved WHERE resolved_at < ?",
+                              (now - self.resolved_ttl,))
+            self.conn.execute("DELETE FROM missing WHERE checked_at < ?",
+                              (now - self.missing_ttl,))
+            self.conn.execute("DELETE FROM unaddable WHERE failed_at < ?",
+                              (now - UNADDABLE_TTL,))
+
+    def get(self, username: str) -> Union[InputPeerUser, _Missing, None]:
+        """Cached input peer, MISSING for a known-bad name, or None if unknown"""
+        result = self.peek(username)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def peek(self, username: str) -> Union[InputPeerUser, _Missing, None]:
+        """Like get, without counting towards hit statistics"""
+        username = username.lstrip('@')
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT user_id, access_hash, resolved_at FROM resolved WHERE username = ?",
+            (username,)
+        ).fetchone()
+        if row and now - row[2] < self.resolved_ttl:
+            return InputPeerUser(user_id=row[0], access_hash=row[1])
+
+        row = self.conn.execute(
+            "SELECT checked_at FROM missing WHERE username = ?", (username,)
+        ).fetchone()
+        if row and now - row[0] < self.missing_ttl:
+            return MISSING
+        return None
+
+    def put(self, username: str, user) -> Optional[InputPeerUser]:
+        """Cache a resolved Telethon user, returns its input peer"""
+        access_hash = getattr(user, 'access_hash', None)
+        if access_hash is None:
+            return None
+        username = username.lstrip('@')
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO resolved VALUES (?, ?, ?, ?)",
+                (username, user.id, access_hash, time.time())
+            )
+            self.conn.execute("DELETE FROM missing WHERE username = ?", (username,))
+        return InputPeerUser(user_id=user.id, access_hash=access_hash)
+
+    def put_missing(self, username: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO missing VALUES (?, ?)",
+                (username.lstrip('@'), time.time())
+            )
+
+    def unaddable_reason(self, username: str) -> Optional[str]:
+        """Why a user could not be added to any group before, if known"""
+        row = self.conn.execute(
+            "SELECT reason, failed_at FROM unaddable WHERE username = ?",
+            (username.lstrip('@'),)
+        ).fetchone()
+        if row and time.time() - row[1] < UNADDABLE_TTL:
+            return row[0]
+        return None
+
+    def put_unaddable(self, username: str, reason: str) -> None:
+        """Remember a failure that no target group or retry will fix"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO unaddable VALUES (?, ?, ?)",
+                (username.lstrip('@'), reason, time.time())
+            )
+
+    def invalidate(self, username: str) -> None:
+        """Forget a cached resolution, e.g. after the username changed owner"""
+        with self.conn:
+            self.conn.execute("DELETE FROM resolved WHERE username = ?", (username.lstrip('@'),))
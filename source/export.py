@@ -0,0 +1,132 @@
+import os
+import heapq
+import tempfile
+from typing import Iterable, Iterator, List
+
+# Constants
+RUN_SIZE = 50_000  # usernames sorted in memory per merge run
+
+
+class UserExportWriter:
+    """Stream scraped usernames to disk with bounded memory
+
+    Every batch is appended to a spool file (``<filename>.part``) as soon
+    as it arrives, so an interrupted scrape keeps everything fetched so far.
+    ``finalize`` turns the spool into the sorted, de-duplicated output with
+    an external merge sort, holding at most ``run_size`` names in memory.
+    """
+
+    def __init__(self, filename: str, run_size: int = RUN_SIZE):
+        self.filename = filename
+        self.spool_path = filename + '.part'
+        self.run_size = run_size
+        self.written = 0
+        self.batches = 0
+        self._spool = None
+
+    def open(self, resume_size: int = None) -> 'UserExportWriter':
+        """Open the spool for appending
+
+        With ``resume_size`` the spool is cut back to that many bytes first,
+        dropping any batch written after the last committed checkpoint.
+        Raises ValueError if the spool is shorter than that, since cutting
+        would pad it with NUL bytes; check ``can_resume`` first.
+        """
+        if resume_size is not None and not self.can_resume(resume_size):
+            raise ValueError(f"{self.spool_path} is missing or shorter than {resume_size} bytes")
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        if resume_size is not None:
+            self._spool.truncate(resume_size)
+            self._spool.seek(resume_size)
+        return self
+
+    def can_resume(self, resume_size: int) -> bool:
+        """Whether the spool still holds everything a checkpoint committed"""
+        return os.path.exists(self.spool_path) and \
+            os.path.getsize(self.spool_path) >= resume_size
+
+    @property
+    def size(self) -> int:
+        """Bytes committed to the spool so far"""
+        return self._spool.tell() if self._spool else 0
+
+    def write_batch(self, usernames: Iterable[str]) -> int:
+        """Append one batch to the spool and flush it to disk"""
+        lines = [f"{name}\n" for name in set(usernames)]
+        if lines:
+            self._spool.writelines(lines)
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+        self.written += len(lines)
+        self.batches += 1
+        return len(lines)
+
+    def close(self) -> None:
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+
+    def discard(self) -> None:
+        """Drop the spool without producing output"""
+        self.close()
+        if os.path.exists(self.spool_path):
+            os.remove(self.spool_path)
+
+    def finalize(self) -> int:
+        """Sort and de-duplicate the spool into the output file
+
+        Returns the number of unique usernames written.
+        """
+        self.close()
+        run_dir = tempfile.mkdtemp(prefix='telety_runs_', dir=os.path.dirname(
+            os.path.abspath(self.filename)))
+        runs = []
+        try:
+            for chunk in _read_chunks(self.spool_path, self.run_size):
+                run_path = os.path.join(run_dir, f"run_{len(runs)}.txt")
+                with open(run_path, 'w', encoding='utf-8') as f:
+                    f.writelines(f"{name}\n" for name in sorted(set(chunk)))
+                runs.append(run_path)
+
+            unique = 0
+            tmp_path = self.filename + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as out:
+                for name in _unique(heapq.merge(*[_read_lines(p) for p in runs])):
+                    out.write(f"{name}\n")
+                    unique += 1
+            os.replace(tmp_path, self.filename)
+            os.remove(self.spool_path)
+            return unique
+        finally:
+            for run_path in runs:
+                if os.path.exists(run_path):
+                    os.remove(run_path)
+            os.rmdir(run_dir)
+
+
+def _read_lines(path: str) -> Iterator[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                yield line
+
+
+def _read_chunks(path: str, size: int) -> Iterator[List[str]]:
+    chunk = []
+    for line in _read_lines(path):
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _unique(names: Iterable[str]) -> Iterator[str]:
+    """Drop adjacent duplicates from a sorted stream"""
+    last = None
+    for name in names:
+        if name != last:
+            yield name
+            last = name
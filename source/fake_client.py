@@ -0,0 +1,483 @@
+import asyncio
+import re
+import time
+from array import array
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from telethon import errors, events
+from telethon.tl.functions.channels import (
+    GetParticipantsRequest,
+    GetParticipantRequest,
+    InviteToChannelRequest
+)
+from telethon.tl.functions.messages import (
+    SendMessageRequest,
+    SendMediaRequest,
+    SendMultiMediaRequest
+)
+from telethon.tl.types import (
+    User,
+    Channel,
+    ChatAdminRights,
+    ChatPhotoEmpty,
+    ChannelParticipantAdmin,
+    InputPeerChannel,
+    UpdateChannel,
+    Updates
+)
+from telethon.tl.types.channels import (
+    ChannelParticipants,
+    ChannelParticipant,
+    ChannelParticipantsNotModified
+)
+from member_store import participants_hash
+
+# Synthetic id ranges
+USER_ID_BASE = 1_000_000
+GROUP_ID_BASE = 5_000
+BOT_ID = 999
+SELF_ID = 1000
+
+_USERNAME_RE = re.compile(r'^@?user(\d+)$', re.IGNORECASE)
+_LINK_RE = re.compile(r'^(?:https?://)?(?:t\.me|telegram\.me)/(?:joinchat/)?@?([\w+]+)/?$')
+
+
+def _request_name(request) -> str:
+    return type(request).__name__
+
+
+class FakeGroup:
+    """Synthetic megagroup with members generated from an id range"""
+
+    def __init__(self, group_id: int, member_count: int, username: str = None,
+                 title: str = None, first_user: int = 0, no_username_every: int = 10,
+                 bot_is_admin: bool = True):
+        self.id = group_id
+        self.username = username
+        self.title = title or f"Bench Group {group_id}"
+        self.no_username_every = no_username_every
+        self.bot_is_admin = bot_is_admin
+        # A range costs nothing until the group is mutated
+        self._members = range(USER_ID_BASE + first_user,
+                              USER_ID_BASE + first_user + member_count)
+        self._member_set = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def _materialize(self) -> None:
+        if isinstance(self._members, range):
+            self._members = array('q', self._members)
+            self._member_set = set(self._members)
+
+    def page(self, offset: int, limit: int):
+        return self._members[offset:offset + limit]
+
+    def has_member(self, user_id: int) -> bool:
+        if self._member_set is not None:
+            return user_id in self._member_set
+        return user_id in self._members
+
+    def add_member(self, user_id: int) -> bool:
+        if self.has_member(user_id):
+            return False
+        self._materialize()
+        self._members.append(user_id)
+        self._member_set.add(user_id)
+        return True
+
+    def remove_member(self, user_id: int) -> bool:
+        if not self.has_member(user_id):
+            return False
+        self._materialize()
+        self._members.remove(user_id)
+        self._member_set.discard(user_id)
+        return True
+
+    def entity(self) -> Channel:
+        return Channel(
+            id=self.id,
+            title=self.title,
+            photo=ChatPhotoEmpty(),
+            date=None,
+            megagroup=True,
+            access_hash=self.id * 7,
+            username=self.username,
+            participants_count=len(self)
+        )
+
+
+def make_user(user_id: int, no_username_every: int = 10) -> User:
+    """Build the synthetic user record for an id"""
+    has_username = not no_username_every or user_id % no_username_every != 0
+    return User(
+        id=user_id,
+        access_hash=user_id * 31,
+        first_name=f"User {user_id}",
+        username=f"user{user_id}" if has_username else None,
+        bot=user_id % 997 == 0,
+        deleted=user_id % 1009 == 0
+    )
+
+
+class FakeMessage:
+    """Minimal stand-in for a Telethon Message"""
+
+    _next_id = 1
+
+    def __init__(self, text: str = '', media=None, chat_id: int = None,
+                 sender_id: int = None, grouped_id: int = None):
+        self.id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+        self.text = text
+        self.message = text
+        self.raw_text = text
+        self.entities = None
+        self.media = media
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.grouped_id = grouped_id
+        self.date = datetime.now()
+
+
+class FakeEvent:
+    """Minimal stand-in for events.NewMessage.Event"""
+
+    def __init__(self, client: 'FakeTelegramClient', message: FakeMessage,
+                 is_private: bool = True):
+        self.client = client
+        self.message = message
+        self.text = message.text
+        self.raw_text = message.text
+        self.chat_id = message.chat_id
+        self.sender_id = message.sender_id
+        self.is_private = is_private
+        self.is_group = not is_private
+        self.is_channel = not is_private
+        self.replies: List[str] = []
+
+    async def reply(self, message: str = '', **kwargs) -> FakeMessage:
+        self.replies.append(message)
+        return FakeMessage(message, chat_id=self.chat_id, sender_id=BOT_ID)
+
+    async def respond(self, message: str = '', **kwargs) -> FakeMessage:
+        return await self.reply(message, **kwargs)
+
+    async def get_chat(self):
+        return await self.client.get_entity(self.chat_id)
+
+    async def get_sender(self):
+        return await self.client.get_entity(self.sender_id)
+
+
+class FakeAlbumEvent(FakeEvent):
+    """Minimal stand-in for events.Album.Event"""
+
+    def __init__(self, client: 'FakeTelegramClient', messages: List[FakeMessage],
+                 is_private: bool = True):
+        super().__init__(client, messages[0], is_private=is_private)
+        self.messages = messages
+        self.grouped_id = messages[0].grouped_id
+
+
+class FakeTelegramClient:
+    """Offline TelegramClient stand-in for benchmarks
+
+    Answers the RPCs Telety uses with synthetic data, with optional
+    per-call latency, periodic FloodWait injection and per-method
+    rate limits that raise FloodWait the way the server does.
+    """
+
+    def __init__(self, groups: List[FakeGroup] = None, latency: float = 0.0,
+                 flood_every: int = 0, flood_seconds: int = 5,
+                 rate_limits: Dict[str, Tuple[int, float]] = None,
+                 privacy_every: int = 0, peer_flood_after: int = 0, is_bot: bool = False,
+                 universe: int = 10_000_000, clock=time.monotonic):
+        self.groups: Dict[int, FakeGroup] = {g.id: g for g in (groups or [])}
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.rate_limits = rate_limits or {}
+        self.privacy_every = privacy_every
+        self.peer_flood_after = peer_flood_after
+        self.is_bot = is_bot
+        self.universe = universe
+        self.clock = clock
+        self.rpc_counts: Counter = Counter()
+        self.flood_waits = 0
+        self.sent: List[Tuple[int, str]] = []
+        self.messages: Dict[Tuple[int, int], FakeMessage] = {}
+        self._random_ids = set()
+        self._calls = 0
+        self._windows: Dict[str, deque] = {}
+        self._handlers = []
+        self._connected = False
+        self._disconnected = None
+
+    @property
+    def rpc_total(self) -> int:
+        return sum(self.rpc_counts.values())
+
+    def add_group(self, group: FakeGroup) -> None:
+        self.groups[group.id] = group
+
+    async def _rpc(self, name: str, request=None) -> None:
+        """Account for one RPC: latency, injected FloodWait, rate limits"""
+        self.rpc_counts[name] += 1
+        self._calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.flood_every and self._calls % self.flood_every == 0:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=request, capture=self.flood_seconds)
+
+        limit = self.rate_limits.get(name)
+        if limit:
+            calls, period = limit
+            now = self.clock()
+            window = self._windows.setdefault(name, deque())
+            while window and now - window[0] >= period:
+                window.popleft()
+            if len(window) >= calls:
+                self.flood_waits += 1
+                wait = max(1, int(period - (now - window[0])) + 1)
+                raise errors.FloodWaitError(request=request, capture=wait)
+            window.append(now)
+
+    # --- connection lifecycle -------------------------------------------
+
+    async def connect(self) -> None:
+        self._connected = True
+
+    async def start(self, *args, **kwargs) -> 'FakeTelegramClient':
+        await self.connect()
+        return self
+
+    async def disconnect(self) -> None:
+        self._connected = False
+        if self._disconnected and not self._disconnected.done():
+            self._disconnected.set_result(None)
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def run_until_disconnected(self) -> None:
+        self._disconnected = asyncio.get_running_loop().create_future()
+        await self._disconnected
+
+    # --- entities -------------------------------------------------------
+
+    def _find_group(self, key) -> Optional[FakeGroup]:
+        if isinstance(key, int):
+            if key < 0:
+                key = int(str(key)[4:]) if str(key).startswith('-100') else -key
+            return self.groups.get(key)
+        if isinstance(key, str):
+            match = _LINK_RE.match(key.strip())
+            name = (match.group(1) if match else key.strip()).lstrip('@').lower()
+            for group in self.groups.values():
+                if group.username and group.username.lower() == name:
+                    return group
+        channel_id = getattr(key, 'channel_id', None) or getattr(key, 'id', None)
+        if channel_id is not None and not isinstance(key, (int, str)):
+            return self.groups.get(channel_id)
+        return None
+
+    def _user_id(self, key) -> Optional[int]:
+        if isinstance(key, int):
+            if key in (BOT_ID, SELF_ID):
+                return key
+            return key if USER_ID_BASE <= key < USER_ID_BASE + self.universe else None
+        if isinstance(key, str):
+            match = _USERNAME_RE.match(key.strip())
+            if not match:
+                return None
+            user_id = int(match.group(1))
+            return self._user_id(user_id)
+        user_id = getattr(key, 'user_id', None) or getattr(key, 'id', None)
+        return user_id
+
+    async def get_me(self, input_peer: bool = False) -> User:
+        await self._rpc('GetUsersRequest')
+        return User(id=BOT_ID if self.is_bot else SELF_ID, is_self=True,
+                    bot=self.is_bot, access_hash=1, username='telety_bench')
+
+    async def get_entity(self, entity):
+        is_name = isinstance(entity, str)
+        await self._rpc('ResolveUsernameRequest' if is_name else 'GetChannelsRequest')
+        group = self._find_group(entity)
+        if group is not None:
+            return group.entity()
+        user_id = self._user_id(entity)
+        if user_id is not None:
+            return make_user(user_id)
+        if is_name:
+            raise ValueError(f'No user has "{entity}" as username')
+        raise ValueError(f'Could not find the input entity for {entity!r}')
+
+    async def get_input_entity(self, entity):
+        # Telethon answers known peers from the session cache without an RPC
+        group = self._find_group(entity)
+        if group is not None:
+            return InputPeerChannel(channel_id=group.id, access_hash=group.id * 17)
+        return await self.get_entity(entity)
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        await self._rpc('GetMessagesRequest')
+        chat_id = entity if isinstance(entity, int) else getattr(entity, 'id', None)
+        if isinstance(ids, (list, tuple)):
+            return [self.messages.get((chat_id, i)) for i in ids]
+        return self.messages.get((chat_id, ids))
+
+    # --- requests -------------------------------------------------------
+
+    async def __call__(self, request, ordered: bool = False):
+        name = _request_name(request)
+        await self._rpc(name, request)
+
+        if isinstance(request, GetParticipantsRequest):
+            group = self._find_group(request.channel)
+            if group is None:
+                raise errors.ChannelPrivateError(request=request)
+            page = group.page(request.offset, request.limit)
+            if request.hash and request.hash == participants_hash(page):
+                return ChannelParticipantsNotModified()
+            users = [make_user(uid, group.no_username_every) for uid in page]
+            return ChannelParticipants(count=len(group), participants=[],
+                                       chats=[], users=users)
+
+        if isinstance(request, InviteToChannelRequest):
+            group = self._find_group(request.channel)
+            if group is None:
+                raise errors.ChannelPrivateError(request=request)
+            if self.peer_flood_after and self.rpc_counts[name] > self.peer_flood_after:
+                raise errors.PeerFloodError(request=request)
+            updates = []
+            for user in request.users:
+                user_id = self._user_id(user)
+                if self.privacy_every and user_id % self.privacy_every == 0:
+                    raise errors.UserPrivacyRestrictedError(request=request)
+                # Like the server, only a real add produces an update
+                if group.add_member(user_id):
+                    updates.append(UpdateChannel(channel_id=group.id))
+            return Updates(updates=updates, users=[], chats=[], date=None, seq=0)
+
+        if isinstance(request, GetParticipantRequest):
+            group = self._find_group(request.channel)
+            if group is None:
+                raise errors.ChannelPrivateError(request=request)
+            user_id = self._user_id(request.participant)
+            if user_id == BOT_ID and group.bot_is_admin:
+                participant = ChannelParticipantAdmin(
+                    user_id=BOT_ID, promoted_by=SELF_ID, date=None,
+                    admin_rights=ChatAdminRights(post_messages=True)
+                )
+                return ChannelParticipant(participant=participant, chats=[], users=[])
+            raise errors.UserNotParticipantError(request=request)
+
+        if isinstance(request, (SendMessageRequest, SendMediaRequest)):
+            group = self._find_group(request.peer)
+            if group is None:
+                raise errors.ChannelPrivateError(request=request)
+            key = (group.id, request.random_id)
+            if key in self._random_ids:
+                raise errors.RandomIdDuplicateError(request=request)
+            self._random_ids.add(key)
+            self.sent.append((group.id, request.message))
+            return Updates(updates=[], users=[], chats=[], date=None, seq=0)
+
+        if isinstance(request, SendMultiMediaRequest):
+            group = self._find_group(request.peer)
+            if group is None:
+                raise errors.ChannelPrivateError(request=request)
+            key = (group.id, request.multi_media[0].random_id)
+            if key in self._random_ids:
+                raise errors.RandomIdDuplicateError(request=request)
+            self._random_ids.add(key)
+            self.sent.append((group.id, request.multi_media[0].message))
+            return Updates(updates=[], users=[], chats=[], date=None, seq=0)
+
+        raise TypeError(f"FakeTelegramClient does not answer {name}, "
+                        f"add a branch for it to FakeTelegramClient.__call__")
+
+    async def send_message(self, entity, message='', **kwargs) -> FakeMessage:
+        await self._rpc('SendMessageRequest')
+        group = self._find_group(entity)
+        if group is None:
+            raise errors.ChannelPrivateError(request=None)
+        self.sent.append((group.id, message))
+        return FakeMessage(message, chat_id=group.id, sender_id=BOT_ID)
+
+    async def send_file(self, entity, file=None, caption=None, **kwargs) -> FakeMessage:
+        album = isinstance(file, (list, tuple))
+        await self._rpc('SendMultiMediaRequest' if album else 'SendMediaRequest')
+        group = self._find_group(entity)
+        if group is None:
+            raise errors.ChannelPrivateError(request=None)
+        self.sent.append((group.id, caption or ''))
+        return FakeMessage(caption or '', media=file, chat_id=group.id, sender_id=BOT_ID)
+
+    # --- events ---------------------------------------------------------
+
+    def on(self, event):
+        def decorator(callback):
+            self.add_event_handler(callback, event)
+            return callback
+        return decorator
+
+    def add_event_handler(self, callback, event=None) -> None:
+        if isinstance(event, type):
+            event = event()
+        self._handlers.append((event, callback))
+
+    async def emit_message(self, text: str = '', sender_id: int = SELF_ID,
+                           chat_id: int = None, media=None,
+                           grouped_id: int = None) -> FakeEvent:
+        """Deliver an incoming message to matching NewMessage handlers"""
+        is_private = chat_id is None
+        message = FakeMessage(text, media=media,
+                              chat_id=sender_id if is_private else chat_id,
+                              sender_id=sender_id, grouped_id=grouped_id)
+        self.messages[(message.chat_id, message.id)] = message
+        event = FakeEvent(self, message, is_private=is_private)
+        for builder, callback in list(self._handlers):
+            if isinstance(builder, (events.Raw, events.Album)):
+                continue
+            pattern = getattr(builder, 'pattern', None)
+            if pattern and not pattern(text or ''):
+                continue
+            await callback(event)
+        return event
+
+    async def emit_album(self, items: List[Tuple[str, object]], sender_id: int = SELF_ID,
+                         chat_id: int = None) -> 'FakeAlbumEvent':
+        """Deliver (caption, media) items as one album, like Telegram does
+
+        Every item reaches NewMessage handlers first, then the Album
+        handlers get all of them in one event.
+        """
+        grouped_id = FakeMessage._next_id * 1000
+        album = []
+        for caption, media in items:
+            event = await self.emit_message(caption, sender_id=sender_id, chat_id=chat_id,
+                                            media=media, grouped_id=grouped_id)
+            album.append(event.message)
+        event = FakeAlbumEvent(self, album, is_private=chat_id is None)
+        for builder, callback in list(self._handlers):
+            if isinstance(builder, events.Album):
+                await callback(event)
+        return event
+
+    async def emit_update(self, update) -> None:
+        """Deliver a raw update to matching Raw handlers"""
+        for builder, callback in list(self._handlers):
+            if not isinstance(builder, events.Raw):
+                continue
+            if builder.types and not isinstance(update, builder.types):
+                continue
+            await callback(update)
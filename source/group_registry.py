@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+from telethon import utils
+from telethon.tl.types import PeerChannel
+
+logger = logging.getLogger(__name__)
+
+# Constants
+GROUP_DB = 'bot_groups.db'
+LEGACY_GROUPS_FILE = 'bot_groups.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    chat_id       INTEGER PRIMARY KEY,
+    title         TEXT,
+    added_at      REAL NOT NULL,
+    last_verified REAL,
+    last_post_at  REAL,
+    last_post_ok  INTEGER
+);
+"""
+
+
+class GroupInfo:
+    """In-memory record of one registered group"""
+
+    __slots__ = ('title', 'added_at', 'last_verified', 'last_post_at', 'last_post_ok')
+
+    def __init__(self, title: Optional[str], added_at: float, last_verified: float = None,
+                 last_post_at: float = None, last_post_ok: Optional[bool] = None):
+        self.title = title
+        self.added_at = added_at
+        self.last_verified = last_verified
+        self.last_post_at = last_post_at
+        self.last_post_ok = last_post_ok
+
+
+class GroupRegistry:
+    """Groups the bot posts to, keyed by marked chat id
+
+    Every change is a single-row upsert or delete in its own transaction,
+    so adding or removing one group costs the same with ten groups or ten
+    thousand. Lookups and iteration are served from an in-memory index.
+    """
+
+    def __init__(self, path: str = GROUP_DB, legacy_file: str = LEGACY_GROUPS_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.groups: Dict[int, GroupInfo] = {
+            row[0]: GroupInfo(row[1], row[2], row[3], row[4],
+                              None if row[5] is None else bool(row[5]))
+            for row in self.conn.execute(
+                """SELECT chat_id, title, added_at, last_verified, last_post_at, last_post_ok
+                   FROM groups""")
+        }
+        if not self.groups and os.path.exists(legacy_file):
+            try:
+                self.import_json(legacy_file)
+            except (ValueError, OSError) as e:
+                # Start without groups rather than not at all; the file is kept
+                logger.error(f"Importing {legacy_file} failed, left it in place: {e}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def import_json(self, legacy_file: str) -> int:
+        """One-time import of the old bot_groups.json, which is then renamed"""
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+        now = time.time()
+        # The old file stored bare channel ids as strings
+        rows = [(utils.get_peer_id(PeerChannel(int(chat_id))), title, now)
+                for chat_id, title in legacy.items()]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO groups (chat_id, title, added_at) VALUES (?, ?, ?)",
+                rows
+            )
+        for chat_id, title, added_at in rows:
+            self.groups.setdefault(chat_id, GroupInfo(title, added_at))
+        os.replace(legacy_file, legacy_file + '.imported')
+        return len(rows)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self.groups))
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.groups
+
+    def get(self, chat_id: int) -> Optional[GroupInfo]:
+        return self.groups.get(chat_id)
+
+    def title(self, chat_id: int) -> str:
+        info = self.groups.get(chat_id)
+        return info.title if info and info.title else str(chat_id)
+
+    def titles(self) -> List[str]:
+        return [self.title(chat_id) for chat_id in self.groups]
+
+    def add(self, chat_id: int, title: Optional[str], verified: bool = True) -> None:
+        """Register a group or refresh its title"""
+        now = time.time()
+        last_verified = now if verified else None
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO groups (chat_id, title, added_at, last_verified)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(chat_id) DO UPDATE SET
+                       title = excluded.title,
+                       last_verified = COALESCE(excluded.last_verified, last_verified)""",
+                (chat_id, title, now, last_verified)
+            )
+        info = self.groups.get(chat_id)
+        if info is None:
+            self.groups[chat_id] = GroupInfo(title, now, last_verified)
+        else:
+            info.title = title
+            info.last_verified = last_verified or info.last_verified
+
+    def remove(self, chat_id: int) -> bool:
+        if self.groups.pop(chat_id, None) is None:
+            return False
+        with self.conn:
+            self.conn.execute("DELETE FROM groups WHERE chat_id = ?", (chat_id,))
+        return True
+
+    def mark_verified(self, chat_id: int) -> None:
+        info = self.groups.get(chat_id)
+        if info is None:
+            return
+        info.last_verified = time.time()
+        with self.conn:
+            self.conn.execute("UPDATE groups SET last_verified = ? WHERE chat_id = ?",
+                              (info.last_verified, chat_id))
+
+    def record_post(self, chat_id: int, ok: bool) -> None:
+        """Remember the outcome of the latest post to a group"""
+        info = self.groups.get(chat_id)
+        if info is None:
+            return
+        info.last_post_at = time.time()
+        info.last_post_ok = ok
+        with self.conn:
+            self.conn.execute(
+                "UPDATE groups SET last_post_at = ?, last_post_ok = ? WHERE chat_id = ?",
+                (info.last_post_at, int(ok), chat_id)
+            )
+
+    def items(self) -> List[Tuple[int, GroupInfo]]:
+        return list(self.groups.items())
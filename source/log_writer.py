@@ -0,0 +1,151 @@
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+import traceback
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Union
+
+# Constants
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'telety.jsonl')
+ERROR_FILE = 'errors.txt'
+MAX_BYTES = 5 * 1024 * 1024  # size at which a log file is rotated
+BACKUP_COUNT = 3  # rotated files kept per log
+QUEUE_SIZE = 10000  # lines buffered for the writer before new ones are dropped
+
+# Fields callers can pass through ``extra``
+EXTRA_FIELDS = ('error', 'rpc', 'target')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'module': record.name,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['traceback'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread and never blocks the caller
+
+    When the writer falls behind and the queue is full, records are
+    dropped and counted; a warning with the count is queued as soon as
+    there is room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what cannot wait; JSON is built in the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if getattr(record, 'error', None) is None:
+                record.error = record.exc_info[0].__name__
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self._unreported:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"Dropped {self._unreported} log lines, the writer fell behind",
+                }))
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room instead of failing when stopped with a full queue
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """Route all logging through one queue to a background writer thread
+
+    Every record goes to ``logs/telety.jsonl`` as JSON; errors also go to
+    ``errors.txt`` as before. Both files rotate by size. Safe to call more
+    than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    json_handler = RotatingFileHandler(LOG_FILE, maxBytes=MAX_BYTES,
+                                       backupCount=BACKUP_COUNT, encoding='utf-8')
+    json_handler.setFormatter(JsonFormatter())
+    error_handler = RotatingFileHandler(ERROR_FILE, maxBytes=MAX_BYTES,
+                                        backupCount=BACKUP_COUNT, encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s',
+                                                 '%Y-%m-%d %H:%M:%S'))
+
+    log_queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = _Listener(log_queue, json_handler, error_handler,
+                          respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out what is still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def log_error(error: Union[Exception, str], module: str, target: object = None,
+              rpc: Optional[str] = None) -> None:
+    """Log an error with its class, the RPC that raised it and its target
+
+    Telethon's RPC errors carry the request that failed, so ``rpc`` is
+    filled in from it when not given.
+    """
+    setup_logging()
+    if rpc is None:
+        request = getattr(error, 'request', None)
+        if request is not None:
+            rpc = type(request).__name__
+    logging.getLogger(module).error(str(error), extra={
+        'error': type(error).__name__ if isinstance(error, BaseException) else None,
+        'rpc': rpc,
+        'target': None if target is None else str(target),
+    })
@@ -3,6 +3,8 @@ import os
 import qrcode
 from telethon import TelegramClient
 from config import API_ID, API_HASH
+from session_store import BufferedSession
+from metrics import InstrumentedClient
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -58,7 +60,7 @@ async def handle_qr_login(client: TelegramClient) -> bool:
 async def start_login() -> bool:
     """Initialize login process"""
     try:
-        client = TelegramClient('telety_session', API_ID, API_HASH)
+        client = InstrumentedClient(BufferedSession('telety_session'), API_ID, API_HASH)
         await client.connect()
         
         if await client.is_user_authorized():
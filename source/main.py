@@ -9,17 +9,17 @@ os.makedirs('logs', exist_ok=True)
 import os
 import sys
 import asyncio
-from datetime import datetime
 from typing import NoReturn
 from login import check_session, start_login
+from runtime import get_runtime, close_runtime
+import log_writer
+from metrics import start_metrics
 
 
 
 def log_error(error: Exception) -> None:
-    """Log errors to errors.txt"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open("errors.txt", "a") as f:
-        f.write(f"[{timestamp}] {str(error)}\n")
+    """Log errors to errors.txt and the JSON log"""
+    log_writer.log_error(error, 'main')
 
 def clear_screen() -> None:
     """Clear terminal screen"""
@@ -52,6 +52,8 @@ def check_dependencies():
 def handle_logout():
     """Handle user logout"""
     try:
+        # Connected clients would keep using the old authorization
+        get_runtime().release_all()
         if os.path.exists('telety_session.session'):
             os.remove('telety_session.session')
             print("\n✅ Successfully logged out!")
@@ -94,6 +96,8 @@ def main_menu():
     """Display and handle main menu"""
     if not check_dependencies():
         sys.exit(1)
+    log_writer.setup_logging()
+    start_metrics()
         
     while True:
         try:
@@ -128,7 +132,7 @@ def main_menu():
                 choice = input("\n⌨️  Enter your choice (1-2): ").strip()
                 
                 if choice == "1":
-                    asyncio.run(handle_login())
+                    get_runtime().run(handle_login())
                 elif choice == "2":
                     print("\n✨ Thanks for using TELETY!")
                     print("👋 Goodbye!")
@@ -148,6 +152,7 @@ if __name__ == "__main__":
         print(f"\n❌ Fatal error: {str(e)}")
         input("\nPress Enter to exit...")
     finally:
+        close_runtime()
         # Clean up streams if we created them
         if hasattr(sys, 'frozen'):
             sys.stdin.close()
@@ -0,0 +1,301 @@
+import sys
+import sqlite3
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Constants
+MEMBER_DB = 'members.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    user_id     INTEGER PRIMARY KEY,
+    access_hash INTEGER,
+    username    TEXT COLLATE NOCASE,
+    first_name  TEXT,
+    last_name   TEXT,
+    is_bot      INTEGER NOT NULL DEFAULT 0,
+    is_deleted  INTEGER NOT NULL DEFAULT 0,
+    updated_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_members_username ON members(username);
+
+CREATE TABLE IF NOT EXISTS groups (
+    group_id     INTEGER PRIMARY KEY,
+    username     TEXT COLLATE NOCASE,
+    title        TEXT,
+    last_scraped TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_groups_username ON groups(username);
+
+CREATE TABLE IF NOT EXISTS memberships (
+    group_id   INTEGER NOT NULL,
+    user_id    INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen  TEXT NOT NULL,
+    PRIMARY KEY (group_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_memberships_user ON memberships(user_id);
+
+CREATE TABLE IF NOT EXISTS participant_pages (
+    group_id    INTEGER NOT NULL,
+    page_offset INTEGER NOT NULL,
+    hash        INTEGER NOT NULL,
+    user_ids    BLOB NOT NULL,
+    PRIMARY KEY (group_id, page_offset)
+) WITHOUT ROWID;
+"""
+
+
+def participants_hash(user_ids: Iterable[int]) -> int:
+    """Telegram's 64-bit cache hash over a page of participant ids"""
+    h = 0
+    for user_id in user_ids:
+        h ^= h >> 21
+        h ^= (h << 35) & 0xFFFFFFFFFFFFFFFF
+        h ^= h >> 4
+        h = (h + user_id) & 0xFFFFFFFFFFFFFFFF
+    # The TL field is a signed long
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class MemberStore:
+    """SQLite store of scraped members, groups and memberships
+
+    Keeps the full user record instead of just the username. Every scraped
+    batch is written with one executemany per table inside one transaction.
+    """
+
+    def __init__(self, path: str = MEMBER_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def upsert_group(self, entity) -> int:
+        """Record the scraped group, returns its id"""
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO groups (group_id, username, title, last_scraped)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(group_id) DO UPDATE SET
+                       username = excluded.username,
+                       title = excluded.title,
+                       last_scraped = excluded.last_scraped""",
+                (entity.id, getattr(entity, 'username', None),
+                 getattr(entity, 'title', None), _now())
+            )
+        return entity.id
+
+    def add_batch(self, group_id: int, users: Iterable) -> int:
+        """Bulk upsert one GetParticipants batch of Telethon users"""
+        now = _now()
+        with self.conn:
+            user_ids = self._upsert_members(users, now)
+            self.conn.executemany(
+                """INSERT INTO memberships (group_id, user_id, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(group_id, user_id) DO UPDATE SET last_seen = excluded.last_seen""",
+                [(group_id, user_id, now, now) for user_id in user_ids]
+            )
+        return len(user_ids)
+
+    def upsert_members(self, users: Iterable) -> int:
+        """Refresh member records without touching memberships"""
+        with self.conn:
+            return len(self._upsert_members(users, _now()))
+
+    def _upsert_members(self, users: Iterable, now: str) -> List[int]:
+        rows = [
+            (u.id, getattr(u, 'access_hash', None), u.username,
+             getattr(u, 'first_name', None), getattr(u, 'last_name', None),
+             int(bool(getattr(u, 'bot', False))), int(bool(getattr(u, 'deleted', False))), now)
+            for u in users
+        ]
+        if rows:
+            self.conn.executemany(
+                """INSERT INTO members (user_id, access_hash, username, first_name,
+                                        last_name, is_bot, is_deleted, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET
+                       access_hash = excluded.access_hash,
+                       username = excluded.username,
+                       first_name = excluded.first_name,
+                       last_name = excluded.last_name,
+                       is_bot = excluded.is_bot,
+                       is_deleted = excluded.is_deleted,
+                       updated_at = excluded.updated_at""",
+                rows
+            )
+        return [row[0] for row in rows]
+
+    def page_hashes(self, group_id: int) -> Dict[int, int]:
+        """Cached participants hash per page offset from the last scrape"""
+        rows = self.conn.execute(
+            "SELECT page_offset, hash FROM participant_pages WHERE group_id = ?",
+            (group_id,)
+        )
+        return dict(rows)
+
+    def page_ids(self, group_id: int, offset: int) -> List[int]:
+        row = self.conn.execute(
+            "SELECT user_ids FROM participant_pages WHERE group_id = ? AND page_offset = ?",
+            (group_id, offset)
+        ).fetchone()
+        return array('q', row[0]).tolist() if row else []
+
+    def save_page(self, group_id: int, offset: int, user_ids: List[int]) -> int:
+        """Remember a page's ids and hash for the next incremental scrape"""
+        page_hash = participants_hash(user_ids)
+        with self.conn:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO participant_pages
+                   (group_id, page_offset, hash, user_ids) VALUES (?, ?, ?, ?)""",
+                (group_id, offset, page_hash, array('q', user_ids).tobytes())
+            )
+        return page_hash
+
+    def drop_pages_from(self, group_id: int, offset: int) -> None:
+        """Forget cached pages past the end of a shrunken group"""
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM participant_pages WHERE group_id = ? AND page_offset >= ?",
+                (group_id, offset)
+            )
+
+    def has_members(self, group_id: int) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM memberships WHERE group_id = ? LIMIT 1", (group_id,)
+        ).fetchone()
+        return row is not None
+
+    def begin_snapshot(self) -> None:
+        """Start collecting the ids seen by an incremental scrape"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (user_id INTEGER PRIMARY KEY)")
+        with self.conn:
+            self.conn.execute("DELETE FROM temp.seen")
+
+    def mark_seen(self, user_ids: Iterable[int]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO temp.seen (user_id) VALUES (?)",
+                ((user_id,) for user_id in user_ids)
+            )
+
+    def apply_snapshot(self, group_id: int, on_join, on_leave) -> Tuple[int, int]:
+        """Diff the seen ids against stored memberships and commit them
+
+        ``on_join``/``on_leave`` are called with (user_id, username) for each
+        change before the memberships table is updated. Returns the number
+        of joins and leaves.
+        """
+        joins = leaves = 0
+        for user_id, username in self.conn.execute(
+                """SELECT s.user_id, m.username FROM temp.seen s
+                   LEFT JOIN members m ON m.user_id = s.user_id
+                   WHERE NOT EXISTS (SELECT 1 FROM memberships ms
+                                     WHERE ms.group_id = ? AND ms.user_id = s.user_id)""",
+                (group_id,)):
+            on_join(user_id, username)
+            joins += 1
+        for user_id, username in self.conn.execute(
+                """SELECT ms.user_id, m.username FROM memberships ms
+                   LEFT JOIN members m ON m.user_id = ms.user_id
+                   WHERE ms.group_id = ?
+                     AND NOT EXISTS (SELECT 1 FROM temp.seen s WHERE s.user_id = ms.user_id)""",
+                (group_id,)):
+            on_leave(user_id, username)
+            leaves += 1
+
+        now = _now()
+        with self.conn:
+            self.conn.execute(
+                """DELETE FROM memberships WHERE group_id = ?
+                   AND user_id NOT IN (SELECT user_id FROM temp.seen)""",
+                (group_id,)
+            )
+            self.conn.execute(
+                """INSERT INTO memberships (group_id, user_id, first_seen, last_seen)
+                   SELECT ?, user_id, ?, ? FROM temp.seen WHERE true
+                   ON CONFLICT(group_id, user_id) DO UPDATE SET last_seen = excluded.last_seen""",
+                (group_id, now, now)
+            )
+            self.conn.execute("DELETE FROM temp.seen")
+        return joins, leaves
+
+    def find_group(self, name_or_id: str) -> Optional[int]:
+        """Look up a stored group by username or id"""
+        name = str(name_or_id).lstrip('@')
+        row = self.conn.execute(
+            "SELECT group_id FROM groups WHERE username = ? OR group_id = ?",
+            (name, int(name) if name.lstrip('-').isdigit() else None)
+        ).fetchone()
+        return row[0] if row else None
+
+    def common_members(self, group_a: int, group_b: int) -> List[Tuple[int, Optional[str]]]:
+        """Members present in both groups"""
+        return self.conn.execute(
+            """SELECT m.user_id, m.username
+               FROM memberships a
+               JOIN memberships b ON b.user_id = a.user_id AND b.group_id = ?
+               JOIN members m ON m.user_id = a.user_id
+               WHERE a.group_id = ?
+               ORDER BY m.username""",
+            (group_b, group_a)
+        ).fetchall()
+
+    def count_by_group(self) -> List[Tuple[int, Optional[str], int]]:
+        """Member count per stored group"""
+        return self.conn.execute(
+            """SELECT g.group_id, COALESCE(g.username, g.title), COUNT(ms.user_id)
+               FROM groups g
+               LEFT JOIN memberships ms ON ms.group_id = g.group_id
+               GROUP BY g.group_id
+               ORDER BY 3 DESC"""
+        ).fetchall()
+
+    def member_usernames(self, group_id: int) -> List[str]:
+        """Usernames of a group's members, sorted"""
+        rows = self.conn.execute(
+            """SELECT m.username FROM memberships ms
+               JOIN members m ON m.user_id = ms.user_id
+               WHERE ms.group_id = ? AND m.username IS NOT NULL
+               ORDER BY m.username""",
+            (group_id,)
+        )
+        return [row[0] for row in rows]
+
+
+def main() -> None:
+    """Small query CLI: counts | common <group> <group>"""
+    store = MemberStore()
+    try:
+        args = sys.argv[1:]
+        if args[:1] == ['common'] and len(args) == 3:
+            a, b = store.find_group(args[1]), store.find_group(args[2])
+            if a is None or b is None:
+                print("❌ Group not found in member database")
+                return
+            rows = store.common_members(a, b)
+            for user_id, username in rows:
+                print(username or user_id)
+            print(f"\n👥 {len(rows)} members in both groups")
+        elif args[:1] == ['counts']:
+            for group_id, name, count in store.count_by_group():
+                print(f"📌 {name or group_id}: {count}")
+        else:
+            print("Usage: python member_store.py counts | common <group> <group>")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
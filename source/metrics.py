@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import bisect
+import logging
+import threading
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+from log_writer import DroppingQueueHandler
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SNAPSHOT_FILE = 'metrics.json'
+SNAPSHOT_INTERVAL = 60  # seconds between snapshot writes
+METRICS_HOST = '127.0.0.1'  # the endpoint is for local scrapers only
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (type, help) of every metric that is exported
+METRICS = {
+    'telety_rpc_calls_total': ('counter', "RPCs sent, by module, request type and outcome"),
+    'telety_rpc_latency_seconds': ('histogram', "RPC round-trip time, by module and request type"),
+    'telety_flood_waits_total': ('counter', "FloodWait errors, by module and request type"),
+    'telety_flood_wait_seconds_total': ('counter', "Seconds Telegram asked to wait"),
+    'telety_sleep_seconds_total': ('counter', "Seconds spent sleeping, by module and reason"),
+    'telety_queue_depth': ('gauge', "Items waiting in a work queue"),
+    'telety_command_calls_total': ('counter', "Bot commands handled"),
+    'telety_command_seconds_total': ('counter', "Seconds spent handling bot commands"),
+    'telety_command_max_seconds': ('gauge', "Slowest handling of a bot command"),
+    'telety_log_dropped_total': ('counter', "Log lines dropped because the writer fell behind"),
+}
+
+# The module an RPC is counted under; entry points set it, tasks inherit it
+current_module: contextvars.ContextVar = contextvars.ContextVar('telety_module', default='telety')
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Counters, histograms and gauges for the whole process
+
+    Updated from the event loop; read from the HTTP and snapshot threads,
+    which only take copies.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Labels, Histogram] = {}
+        self.gauges: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+        self.collectors: Dict[str, Callable[[], Iterable[Sample]]] = {'log': _log_samples}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_rpc(self, method: str, seconds: float, outcome: str = 'ok',
+                   module: str = None) -> None:
+        module = module or current_module.get()
+        self.inc('telety_rpc_calls_total', module=module, method=method, outcome=outcome)
+        key = (('method', method), ('module', module))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def record_flood_wait(self, method: str, seconds: float, module: str = None) -> None:
+        module = module or current_module.get()
+        self.inc('telety_flood_waits_total', module=module, method=method)
+        self.inc('telety_flood_wait_seconds_total', seconds, module=module, method=method)
+
+    def record_sleep(self, reason: str, seconds: float, module: str = None) -> None:
+        if seconds > 0:
+            self.inc('telety_sleep_seconds_total', seconds,
+                     module=module or current_module.get(), reason=reason)
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        """Register a value read at export time, e.g. a queue's size"""
+        self.gauges[(name, tuple(sorted(labels.items())))] = read
+
+    def remove_gauge(self, name: str, **labels: str) -> None:
+        self.gauges.pop((name, tuple(sorted(labels.items()))), None)
+
+    def add_collector(self, key: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Register a callable yielding (name, labels, value) at export time
+
+        A later collector with the same key replaces the earlier one.
+        """
+        self.collectors[key] = collect
+
+    def samples(self) -> List[Sample]:
+        """Every current value, histograms expanded into bucket/sum/count"""
+        samples = [(name, dict(labels), value)
+                   for (name, labels), value in list(self.counters.items())]
+        for labels, histogram in list(self.histograms.items()):
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append(('telety_rpc_latency_seconds_bucket', dict(labels, le=le), cumulative))
+            samples.append(('telety_rpc_latency_seconds_sum', labels, histogram.total))
+            samples.append(('telety_rpc_latency_seconds_count', labels, histogram.count))
+        for (name, labels), read in list(self.gauges.items()):
+            try:
+                samples.append((name, dict(labels), read()))
+            except Exception as e:
+                logger.warning(f"Reading gauge {name} failed: {e}")
+        for collect in list(self.collectors.values()):
+            try:
+                samples.extend(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return samples
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        grouped: Dict[str, List[str]] = {}
+        for name, labels, value in self.samples():
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    family = name[:-len(suffix)]
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            grouped.setdefault(family, []).append(
+                f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        lines = []
+        for family in sorted(grouped):
+            kind, help_text = METRICS.get(family, ('untyped', ''))
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            lines.extend(grouped[family])
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        return {
+            'time': time.time(),
+            'samples': [{'name': name, 'labels': labels, 'value': value}
+                        for name, labels, value in self.samples()],
+        }
+
+    def write_snapshot(self, path: str = SNAPSHOT_FILE) -> None:
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Writing metrics snapshot failed: {e}")
+
+
+def _log_samples() -> Iterable[Sample]:
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            yield 'telety_queue_depth', {'queue': 'log'}, handler.queue.qsize()
+            yield 'telety_log_dropped_total', {}, handler.dropped
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics registry"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+class InstrumentedClient(TelegramClient):
+    """TelegramClient that times every request it sends
+
+    High-level helpers such as get_entity or iter_participants end up
+    here too, so every RPC is counted once under its TL request type.
+    FloodWaits short enough for Telethon to sleep through are slept here
+    instead, so each one is counted and the sleep stays out of the
+    latency histogram.
+    """
+
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        first = request[0] if isinstance(request, (list, tuple)) and request else request
+        method = type(first).__name__
+        if flood_sleep_threshold is None:
+            flood_sleep_threshold = self.flood_sleep_threshold
+        metrics = get_metrics()
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await self._call(self._sender, request, ordered=ordered,
+                                          flood_sleep_threshold=0)
+            except FloodWaitError as e:
+                metrics.record_rpc(method, time.perf_counter() - started, 'flood_wait')
+                metrics.record_flood_wait(method, e.seconds)
+                if e.seconds > flood_sleep_threshold:
+                    raise
+                logger.info(f"Sleeping {e.seconds}s on a FloodWait for {method}")
+                metrics.record_sleep('flood_wait', e.seconds)
+                await asyncio.sleep(e.seconds)
+                continue
+            except Exception:
+                metrics.record_rpc(method, time.perf_counter() - started, 'error')
+                raise
+            metrics.record_rpc(method, time.perf_counter() - started)
+            return result
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = get_metrics().render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the log
+
+
+_started = False
+
+
+def start_metrics(port: Optional[int] = None, snapshot_file: str = SNAPSHOT_FILE,
+                  interval: float = SNAPSHOT_INTERVAL) -> None:
+    """Write periodic snapshots and, with a port, serve /metrics on localhost
+
+    Both run in daemon threads, so they keep answering while the menu
+    waits for input. ``port`` defaults to $TELETY_METRICS_PORT.
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+    metrics = get_metrics()
+
+    if port is None and os.environ.get('TELETY_METRICS_PORT'):
+        port = int(os.environ['TELETY_METRICS_PORT'])
+    if port:
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint not started: {e}")
+        else:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+            print(f"📈 Metrics at http://{METRICS_HOST}:{port}/metrics")
+
+    stop = threading.Event()
+
+    def write_snapshots():
+        while not stop.wait(interval):
+            metrics.write_snapshot(snapshot_file)
+
+    threading.Thread(target=write_snapshots, name='metrics-snapshot', daemon=True).start()
+
+    def final_snapshot():
+        stop.set()
+        metrics.write_snapshot(snapshot_file)
+
+    atexit.register(final_snapshot)
@@ -0,0 +1,142 @@
+import time
+import random
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Constants
+OUTBOX_DB = 'outbox.db'
+
+# Job states
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+
+# Delivery states
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+RETRY = 'retry'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_chat_id INTEGER NOT NULL,
+    message_id     INTEGER NOT NULL,
+    text           TEXT,
+    status         TEXT NOT NULL,
+    created_at     REAL NOT NULL,
+    finished_at    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+
+CREATE TABLE IF NOT EXISTS deliveries (
+    job_id     INTEGER NOT NULL,
+    chat_id    INTEGER NOT NULL,
+    random_id  INTEGER NOT NULL,
+    state      TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    retry_at   REAL,
+    error      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, chat_id)
+) WITHOUT ROWID;
+"""
+
+
+class Outbox:
+    """Persistent record of broadcast jobs and their per-group delivery
+
+    Each delivery gets a random_id when the job is created. Sends reuse
+    it on every attempt, so a group that already received the message
+    before a crash makes Telegram answer RANDOM_ID_DUPLICATE instead of
+    showing it a second time.
+    """
+
+    def __init__(self, path: str = OUTBOX_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def create_job(self, source_chat_id: int, message_id: int, text: Optional[str],
+                   chat_ids: Iterable[int]) -> int:
+        """Record a new broadcast with one pending delivery per chat"""
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.execute(
+                """INSERT INTO jobs (source_chat_id, message_id, text, status, created_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (source_chat_id, message_id, text, RUNNING, now)
+            )
+            job_id = cursor.lastrowid
+            self.conn.executemany(
+                """INSERT OR IGNORE INTO deliveries (job_id, chat_id, random_id, state, updated_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(job_id, chat_id, random.getrandbits(63), PENDING, now) for chat_id in chat_ids]
+            )
+        return job_id
+
+    def job(self, job_id: int) -> Optional[Tuple[int, int, Optional[str], str]]:
+        """(source_chat_id, message_id, text, status) of a job"""
+        return self.conn.execute(
+            "SELECT source_chat_id, message_id, text, status FROM jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+
+    def unfinished_jobs(self) -> List[int]:
+        rows = self.conn.execute(
+            "SELECT job_id FROM jobs WHERE status = ? ORDER BY job_id", (RUNNING,)
+        )
+        return [row[0] for row in rows]
+
+    def undelivered(self, job_id: int) -> List[Tuple[int, int, Optional[float]]]:
+        """(chat_id, random_id, retry_at) of every delivery not yet final"""
+        return self.conn.execute(
+            """SELECT chat_id, random_id, retry_at FROM deliveries
+               WHERE job_id = ? AND state IN (?, ?)""",
+            (job_id, PENDING, RETRY)
+        ).fetchall()
+
+    def mark(self, job_id: int, chat_id: int, state: str, error: str = None,
+             retry_after: float = None) -> None:
+        """Record the outcome of one delivery attempt"""
+        now = time.time()
+        retry_at = now + retry_after if retry_after is not None else None
+        with self.conn:
+            self.conn.execute(
+                """UPDATE deliveries SET state = ?, error = ?, retry_at = ?, updated_at = ?,
+                                         attempts = attempts + 1
+                   WHERE job_id = ? AND chat_id = ?""",
+                (state, error, retry_at, now, job_id, chat_id)
+            )
+
+    def finish_job(self, job_id: int, status: str = DONE) -> None:
+        """Close a job; when done, deliveries still open count as failed
+
+        A cancelled job keeps them pending so the counts show what was
+        never sent.
+        """
+        with self.conn:
+            if status == DONE:
+                self.conn.execute(
+                    """UPDATE deliveries SET state = ?, updated_at = ?
+                       WHERE job_id = ? AND state IN (?, ?)""",
+                    (FAILED, time.time(), job_id, PENDING, RETRY)
+                )
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                (status, time.time(), job_id)
+            )
+
+    def counts(self, job_id: int) -> Dict[str, int]:
+        """Number of deliveries per state"""
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) FROM deliveries WHERE job_id = ? GROUP BY state",
+            (job_id,)
+        )
+        counts = {PENDING: 0, SENT: 0, FAILED: 0, RETRY: 0}
+        counts.update(dict(rows))
+        return counts
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Optional
+from metrics import get_metrics
+
+# Constants
+PACER_STATE_FILE = 'pacer_state.json'
+SPEEDUP = 0.9  # delay factor after a streak of accepted requests
+SPEEDUP_AFTER = 10  # accepted requests per speedup step
+BACKOFF = 1.5  # delay factor after a FloodWait
+MIN_BACKOFF_DELAY = 1.0  # seconds, so a zero delay can still back off
+FLOOR_DECAY = 0.98  # how fast a learned floor relaxes while requests pass
+SAVE_EVERY = 25  # accepted requests between state saves
+
+
+class MethodPace:
+    """Pacing state for one RPC method"""
+
+    __slots__ = ('delay', 'min_delay', 'max_delay', 'floor', 'next_at',
+                 'blocked_until', 'streak', 'flood_waits')
+
+    def __init__(self, delay: float, min_delay: float, max_delay: float):
+        self.delay = delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.floor = min_delay  # lowest delay known to be safe
+        self.next_at = 0.0
+        self.blocked_until = 0.0
+        self.streak = 0
+        self.flood_waits = 0
+
+
+class AdaptivePacer:
+    """Request pacing shared by scrape, add and post
+
+    Each method starts from a configured delay between calls, shortens it
+    while the server keeps accepting requests, and on FloodWait sleeps the
+    exact number of seconds the server asked for and lengthens the delay.
+    Learned delays are saved per method and reused on the next run.
+    Slots are reserved before sleeping, so concurrent callers on the same
+    method share one budget instead of each pacing independently.
+    """
+
+    def __init__(self, state_file: str = PACER_STATE_FILE, clock=time.monotonic):
+        self.state_file = state_file
+        self.clock = clock
+        self.methods: Dict[str, MethodPace] = {}
+        self._saved: Dict[str, Dict[str, float]] = {}
+        self._unsaved = 0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r') as f:
+                    self._saved = json.load(f)
+        except (OSError, ValueError):
+            self._saved = {}
+
+    def save(self) -> None:
+        """Persist learned delays, keeping methods not used this run"""
+        state = dict(self._saved)
+        for method, pace in self.methods.items():
+            state[method] = {'delay': round(pace.delay, 3), 'floor': round(pace.floor, 3)}
+        try:
+            tmp_path = self.state_file + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+            self._saved = state
+            self._unsaved = 0
+        except OSError:
+            pass
+
+    def configure(self, method: str, delay: float, min_delay: float = 0.0,
+                  max_delay: float = 300.0) -> MethodPace:
+        """Register a method's starting delay; a learned delay takes precedence"""
+        pace = self.methods.get(method)
+        if pace is None:
+            pace = MethodPace(delay, min_delay, max_delay)
+            learned = self._saved.get(method)
+            if learned:
+                pace.floor = max(min_delay, learned.get('floor', min_delay))
+                pace.delay = min(max_delay, max(pace.floor, learned.get('delay', delay)))
+            self.methods[method] = pace
+        return pace
+
+    def delay(self, method: str) -> float:
+        pace = self.methods.get(method)
+        return pace.delay if pace else 0.0
+
+    async def wait(self, method: str) -> None:
+        """Wait for this method's next free slot"""
+        pace = self.configure(method, 0.0)
+        now = self.clock()
+        slot = max(now, pace.next_at)
+        pace.next_at = slot + pace.delay
+        if slot > now:
+            get_metrics().record_sleep('pace', slot - now)
+            await asyncio.sleep(slot - now)
+
+        # A FloodWait seen by another caller while we slept blocks us too
+        while self.clock() < pace.blocked_until:
+            blocked = pace.blocked_until - self.clock()
+            get_metrics().record_sleep('flood_wait', blocked)
+            await asyncio.sleep(blocked)
+
+    def success(self, method: str) -> None:
+        """Record an accepted request and speed up after a streak"""
+        pace = self.configure(method, 0.0)
+        pace.streak += 1
+        if pace.streak % SPEEDUP_AFTER == 0:
+            pace.floor = max(pace.min_delay, pace.floor * FLOOR_DECAY)
+            pace.delay = max(pace.floor, pace.delay * SPEEDUP)
+
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    async def flood_wait(self, method: str, seconds: int) -> None:
+        """Back off after a FloodWait and sleep exactly what the server asked"""
+        pace = self.configure(method, 0.0)
+        pace.flood_waits += 1
+        pace.streak = 0
+        # The delay that triggered the flood is not safe, stay above it
+        pace.floor = min(pace.max_delay, max(pace.floor, pace.delay * BACKOFF))
+        pace.delay = min(pace.max_delay, max(pace.floor, MIN_BACKOFF_DELAY))
+
+        resume_at = self.clock() + seconds
+        pace.blocked_until = max(pace.blocked_until, resume_at)
+        pace.next_at = max(pace.next_at, resume_at)
+        self.save()
+        get_metrics().record_sleep('flood_wait', seconds)
+        await asyncio.sleep(seconds)
+
+
+_pacer: Optional[AdaptivePacer] = None
+
+
+def get_pacer() -> AdaptivePacer:
+    """Process-wide pacer shared by every module"""
+    global _pacer
+    if _pacer is None:
+        _pacer = AdaptivePacer()
+    return _pacer
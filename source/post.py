@@ -1,78 +1,120 @@
 
+import time
 import asyncio
 import logging
-from datetime import datetime
-from typing import Optional, Dict
-import os
-import json
-from telethon import TelegramClient, events
+from typing import Optional, Dict, Tuple
+from telethon import TelegramClient, events, utils, helpers
 from telethon.errors import (
     FloodWaitError, 
     ChatAdminRequiredError, 
+    ChatWriteForbiddenError,
     ChannelPrivateError,
+    RandomIdDuplicateError,
     UserNotParticipantError
 )
-from telethon.tl.types import InputPeerChannel, ChatAdminRights, Channel, Chat
+from telethon.tl.types import (
+    InputPeerChannel, InputSingleMedia, ChatAdminRights, Channel, Chat,
+    UpdateChannel, UpdateChannelParticipant,
+    UpdateChatParticipant, UpdateChatParticipantAdmin
+)
 from telethon.tl.functions.channels import GetParticipantRequest
+from telethon.tl.functions.messages import (
+    SendMessageRequest,
+    SendMediaRequest,
+    SendMultiMediaRequest
+)
 from config import API_ID, API_HASH
 from login import check_session, print_header, clear_screen
-
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    filename='bot.log'
-)
+from broadcast import BroadcastJob, BroadcastScheduler, RetryLater
+from outbox import Outbox, SENT, FAILED, RETRY, CANCELLED
+from group_registry import GroupRegistry
+from drafts import Draft, DraftStore, ALBUM_LIMIT
+from runtime import get_runtime
+from session_store import BufferedSession
+import log_writer
+from metrics import InstrumentedClient, current_module, get_metrics
+
+log_writer.setup_logging()
 logger = logging.getLogger(__name__)
 
-class PostBot:
+# Constants
+ADMIN_CACHE_TTL = 600  # seconds an admin check is trusted without a rights update
+VERIFY_INTERVAL = 6 * 3600  # seconds before a saved group is verified again at startup
+VERIFY_CONCURRENCY = 8  # admin checks in flight during startup verification
+# Updates after which the bot's rights in a chat may have changed
+RIGHTS_UPDATES = (UpdateChannel, UpdateChannelParticipant,
+                  UpdateChatParticipant, UpdateChatParticipantAdmin)
+# Errors that prove the bot cannot post, as opposed to transient failures
+NO_RIGHTS_ERRORS = (UserNotParticipantError, ChatAdminRequiredError,
+                    ChatWriteForbiddenError, ChannelPrivateError)
+
+async def notify_nobody(report: str) -> None:
+    logger.info(report)
+
+class CommandStats:
+    """Call count and handling time of one bot command"""
+
+    __slots__ = ('calls', 'total', 'slowest')
+
     def __init__(self):
-        self.stored_message = None
-        self.target_groups: Dict[str, str] = {}  # str keys for JSON compatibility
-        self.is_posting: bool = False
-        self.client: Optional[TelegramClient] = None
-        self.bot_token: Optional[str] = None
-        self.groups_file = 'bot_groups.json'
-        self.load_saved_groups()
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
 
-    def load_saved_groups(self):
-        """Load saved groups from file"""
-        try:
-            if os.path.exists(self.groups_file):
-                with open(self.groups_file, 'r') as f:
-                    self.target_groups = json.load(f)
-        except Exception as e:
-            self.log_error(e)
-            self.target_groups = {}
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.slowest = max(self.slowest, seconds)
 
-    def save_groups(self):
-        """Save groups to file"""
-        try:
-            with open(self.groups_file, 'w') as f:
-                json.dump(self.target_groups, f)
-        except Exception as e:
-            self.log_error(e)
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
 
-    def log_error(self, error: Exception) -> None:
-        """Log errors to file with fancy formatting"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open("errors.txt", "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] ❌ {str(error)}\n")
-        logger.error(f"Error occurred: {str(error)}")
+class PostBot:
+    def __init__(self):
+        self.drafts = DraftStore()  # sender id -> Draft
+        self.target_groups = GroupRegistry()  # marked chat id -> GroupInfo
+        self.active_job: Optional[BroadcastJob] = None
+        self.resuming: Optional[asyncio.Task] = None  # resume_jobs, while it runs
+        self.last_job: Optional[BroadcastJob] = None
+        self.commands: Dict[str, object] = {}
+        self.command_stats: Dict[str, CommandStats] = {}
+        self.client: Optional[TelegramClient] = None
+        self.bot_token: Optional[str] = None
+        self._me = None
+        self._me_lock = asyncio.Lock()
+        self.admin_cache: Dict[int, Tuple[bool, float]] = {}  # chat id -> (is admin, checked at)
+        self.scheduler = BroadcastScheduler()
+        self.outbox = Outbox()
+        get_metrics().add_collector('commands', self.command_samples)
+
+    def command_samples(self):
+        """Per-command latency counters for the metrics endpoint"""
+        for command, stats in list(self.command_stats.items()):
+            labels = {'command': command}
+            yield 'telety_command_calls_total', labels, stats.calls
+            yield 'telety_command_seconds_total', labels, stats.total
+            yield 'telety_command_max_seconds', labels, stats.slowest
+
+    def log_error(self, error: Exception, target: int = None) -> None:
+        """Log errors to errors.txt and the JSON log"""
+        log_writer.log_error(error, __name__, target)
 
     async def initialize_client(self, bot_token: str) -> bool:
         """Initialize Telethon client with bot token"""
         try:
             self.bot_token = bot_token
-            self.client = TelegramClient('bot_session', API_ID, API_HASH)
+            self.client = InstrumentedClient(BufferedSession('bot_session'), API_ID, API_HASH)
+            # Every FloodWait goes to the broadcast scheduler, which only holds back that chat
+            self.client.flood_sleep_threshold = 0
+            self._me = None
+            self.admin_cache.clear()
             await self.client.start(bot_token=bot_token)
             
             if not await self.client.is_user_authorized():
                 print("\n❌ Invalid bot token!")
                 return False
                 
-            # Verify all saved groups
-            await self.verify_saved_groups()
             print("\n✅ Bot initialized successfully!")
             return True
             
@@ -81,35 +123,84 @@ class PostBot:
             print(f"\n❌ Failed to initialize bot: {str(e)}")
             return False
 
-    async def verify_saved_groups(self):
-        """Verify all saved groups are still valid"""
-        invalid_groups = []
-        for group_id in list(self.target_groups.keys()):
-            try:
-                if not await self.check_bot_permissions(int(group_id)):
-                    invalid_groups.append(group_id)
-            except Exception as e:
-                invalid_groups.append(group_id)
-                self.log_error(e)
-
-        # Remove invalid groups
-        for group_id in invalid_groups:
-            del self.target_groups[str(group_id)]
-        
-        self.save_groups()
+    async def verify_saved_groups(self, max_age: float = VERIFY_INTERVAL):
+        """Re-check saved groups that were not verified recently
+
+        Runs in the background once the handlers are up. Groups that fail
+        are not removed here; the first send to them drops them.
+        """
+        now = time.time()
+        stale = [group_id for group_id, info in self.target_groups.items()
+                 if not info.last_verified or now - info.last_verified > max_age]
+        semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+        async def verify(group_id):
+            async with semaphore:
+                try:
+                    if await self.check_bot_permissions(group_id):
+                        self.target_groups.mark_verified(group_id)
+                except FloodWaitError as e:
+                    # Left unverified, the next start checks it again
+                    self.log_error(e, group_id)
+
+        await asyncio.gather(*(verify(group_id) for group_id in stale))
+        logger.info(f"Verified {len(stale)} of {len(self.target_groups)} saved groups")
+
+    def drop_group(self, group_id: int) -> None:
+        """Stop posting to a group the bot can no longer post in"""
+        title = self.target_groups.title(group_id)
+        if self.target_groups.remove(group_id):
+            logger.warning(f"Removed group {title}: no admin rights anymore")
+
+    async def get_me(self):
+        """The bot's own user, fetched once per client"""
+        if self._me is None:
+            async with self._me_lock:
+                if self._me is None:
+                    self._me = await self.client.get_me()
+        return self._me
+
+    @staticmethod
+    def _chat_key(chat_id) -> int:
+        """Bare chat id, the form raw updates carry"""
+        return utils.resolve_id(int(chat_id))[0]
+
+    def invalidate_permissions(self, chat_id) -> None:
+        """Forget a cached admin check so the next one asks Telegram again"""
+        self.admin_cache.pop(self._chat_key(chat_id), None)
+
+    async def check_bot_permissions(self, chat_id: int) -> Optional[bool]:
+        """Check if bot has required permissions in the group
+
+        Answers are cached for ADMIN_CACHE_TTL seconds, or until a
+        participant/admin update for the chat arrives. Returns None when
+        the check itself failed and raises FloodWaitError, so callers can
+        tell both apart from a real "no".
+        """
+        key = self._chat_key(chat_id)
+        cached = self.admin_cache.get(key)
+        if cached and time.monotonic() - cached[1] < ADMIN_CACHE_TTL:
+            return cached[0]
 
-    async def check_bot_permissions(self, chat_id: int) -> bool:
-        """Check if bot has required permissions in the group"""
         try:
-            bot = await self.client.get_me()
+            bot = await self.get_me()
             participant = await self.client(GetParticipantRequest(
                 channel=chat_id,
                 participant=bot.id
             ))
-            return hasattr(participant.participant, 'admin_rights')
+            is_admin = hasattr(participant.participant, 'admin_rights')
+        except FloodWaitError:
+            raise
+        except NO_RIGHTS_ERRORS as e:
+            self.log_error(e, chat_id)
+            is_admin = False
         except Exception as e:
-            self.log_error(e)
-            return False
+            # Transient failure, ask again next time
+            self.log_error(e, chat_id)
+            return None
+
+        self.admin_cache[key] = (is_admin, time.monotonic())
+        return is_admin
 
     async def verify_group(self, group_id: int, group_title: str = None) -> bool:
         """Verify if a group can be added to the bot's list"""
@@ -122,9 +213,9 @@ class PostBot:
                 group_title = getattr(chat, 'title', 'Unknown Group')
 
             # Check bot permissions
-            if await self.check_bot_permissions(chat.id):
-                self.target_groups[str(chat.id)] = group_title
-                self.save_groups()
+            chat_id = utils.get_peer_id(chat)
+            if await self.check_bot_permissions(chat_id):
+                self.target_groups.add(chat_id, group_title)
                 return True
             return False
         except UserNotParticipantError:
@@ -133,40 +224,231 @@ class PostBot:
         except Exception as e:
             self.log_error(e)
             return False
-    async def send_message_to_group(self, group_id, message):
-        """Send a message to a specific group with error handling"""
+    async def send_message_to_group(self, group_id, draft: Draft, random_id: int = None):
+        """Send a message to a specific group with error handling
+
+        Retrying with the same ``random_id`` lets Telegram drop the message
+        if the group already has it. FloodWaitError and RetryLater are
+        raised so the broadcast scheduler can retry this group later.
+        """
         try:
-            if not await self.check_bot_permissions(int(group_id)):
+            allowed = await self.check_bot_permissions(int(group_id))
+            if allowed is None:
+                raise RetryLater("Admin check failed")
+            if not allowed:
+                # Telegram said no, not a transient failure
+                self.drop_group(group_id)
                 return False
 
-            if message.media:  # If message has media
-                await self.client.send_file(
-                    int(group_id),
-                    file=message.media,
-                    caption=message.text if hasattr(message, 'text') else None
-                )
-            elif hasattr(message, 'text') and message.text:  # For text-only messages
-                await self.client.send_message(
-                    int(group_id),
-                    message=message.text  # Changed from message.text to message=message.text
-                )
+            peer = await self.client.get_input_entity(int(group_id))
+            if random_id is None:
+                random_id = helpers.generate_random_long()
+            if draft.album:  # One request for the whole album
+                await self.client(SendMultiMediaRequest(
+                    peer=peer,
+                    multi_media=[
+                        InputSingleMedia(
+                            media=media,
+                            message=caption,
+                            entities=entities,
+                            # Items need distinct ids, derived so retries repeat them
+                            random_id=(random_id + i) % (1 << 63)
+                        )
+                        for i, (media, caption, entities) in enumerate(draft.album)
+                    ]
+                ))
+            elif draft.media is not None:  # If message has media
+                await self.client(SendMediaRequest(
+                    peer=peer,
+                    media=draft.media,
+                    message=draft.text,
+                    entities=draft.entities,
+                    random_id=random_id
+                ))
+            elif draft.text:  # For text-only messages
+                await self.client(SendMessageRequest(
+                    peer=peer,
+                    message=draft.text,
+                    entities=draft.entities,
+                    random_id=random_id
+                ))
             else:
                 logger.error("Message has no content to send")
                 return False
                 
             return True
                 
-        except FloodWaitError as e:
-            logger.warning(f"Rate limit hit, waiting {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
+        except RandomIdDuplicateError:
+            # Sent before a restart, Telegram dropped the repeat
+            return True
+        except (FloodWaitError, RetryLater):
+            raise
+        except NO_RIGHTS_ERRORS as e:
+            # Rights were lost since the cached check
+            self.invalidate_permissions(group_id)
+            self.drop_group(group_id)
+            self.log_error(e, group_id)
             return False
         except Exception as e:
-            self.log_error(e)
+            self.log_error(e, group_id)
             return False
 
+    async def deliver(self, job_id: int, group_id: int, random_id: int, draft: Draft) -> bool:
+        """Send one outbox delivery and record its outcome"""
+        try:
+            delivered = await self.send_message_to_group(group_id, draft, random_id)
+        except (FloodWaitError, RetryLater) as e:
+            self.outbox.mark(job_id, group_id, RETRY, error=str(e), retry_after=e.seconds)
+            raise
+        self.outbox.mark(job_id, group_id, SENT if delivered else FAILED)
+        return delivered
+
+    async def run_job(self, job: BroadcastJob, draft: Draft) -> Dict[str, int]:
+        """Deliver every group of a job that has not been sent yet"""
+        job_id = job.job_id
+        now = time.time()
+        random_ids = {}
+        for group_id, random_id, retry_at in self.outbox.undelivered(job_id):
+            random_ids[group_id] = random_id
+            if retry_at:
+                self.scheduler.hold(group_id, retry_at - now)
+        job.total = len(random_ids)
+
+        def log_result(group_id, delivered):
+            job.record(delivered)
+            self.target_groups.record_post(group_id, delivered)
+            name = self.target_groups.title(group_id)
+            if delivered:
+                logger.info(f"Successfully posted to {name}")
+            else:
+                logger.error(f"Failed to post to {name}")
+
+        await self.scheduler.run(
+            list(random_ids),
+            lambda group_id: self.deliver(job_id, group_id, random_ids[group_id], draft),
+            on_result=log_result
+        )
+        self.outbox.finish_job(job_id)
+        return self.outbox.counts(job_id)
+
+    def start_job(self, job_id: int, draft: Draft, notify,
+                  owner: Optional[int] = None) -> BroadcastJob:
+        """Run a broadcast as a background task that /status and /cancel see
+
+        ``notify`` is awaited with the final report. Only ``owner`` can stop
+        the job with /cancel.
+        """
+        job = BroadcastJob(job_id, owner=owner)
+        job.task = asyncio.ensure_future(self._run_broadcast(job, draft, notify))
+        self.active_job = job
+        return job
+
+    def broadcast_text(self, text: str) -> BroadcastJob:
+        """Start a plain-text broadcast to every saved group, e.g. for the daemon"""
+        job_id = self.outbox.create_job(0, 0, text, list(self.target_groups))
+        return self.start_job(job_id, Draft(0, 0, text), notify_nobody)
+
+    async def _run_broadcast(self, job: BroadcastJob, draft: Draft, notify):
+        try:
+            counts = await self.run_job(job, draft)
+            success = counts[SENT]
+            failed = counts[FAILED]
+            total = success + failed
+            success_rate = (success / total) * 100 if total > 0 else 0
+            report = (
+                f"📊 <b>Posting Complete!</b> (#{job.job_id})\n\n"
+                f"✅ Success: {success} groups\n"
+                f"❌ Failed: {failed} groups\n"
+                f"📈 Success Rate: {success_rate:.1f}%"
+            )
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                raise  # Shutdown, the outbox resumes the job on next start
+            self.outbox.finish_job(job.job_id, CANCELLED)
+            report = (
+                f"🚫 <b>Broadcast #{job.job_id} cancelled</b>\n\n"
+                f"✅ Sent: {job.sent} groups\n"
+                f"⏭️ Not sent: {job.pending} groups"
+            )
+        except Exception as e:
+            self.log_error(e)
+            report = f"❌ Error during posting: {str(e)}"
+        finally:
+            job.finish()
+            self.last_job = job
+            if self.active_job is job:
+                self.active_job = None
+
+        try:
+            await notify(report)
+        except Exception as e:
+            self.log_error(e)
+
+    def start_resume(self) -> asyncio.Task:
+        """Run resume_jobs in the background; /post waits until it is done"""
+        self.resuming = asyncio.ensure_future(self.resume_jobs())
+        return self.resuming
+
+    @property
+    def busy(self) -> bool:
+        """A broadcast runs, or interrupted ones are still being resumed"""
+        return self.active_job is not None or \
+            (self.resuming is not None and not self.resuming.done())
+
+    async def resume_jobs(self):
+        """Finish broadcasts that a restart interrupted"""
+        for job_id in self.outbox.unfinished_jobs():
+            source_chat_id, message_id, text, _ = self.outbox.job(job_id)
+            if not message_id:
+                # Submitted as plain text through the daemon, nobody to notify
+                logger.info(f"Resuming interrupted broadcast job {job_id}")
+                job = self.start_job(job_id, Draft(source_chat_id, 0, text or ''), notify_nobody)
+                await job.task
+                continue
+            try:
+                message = await self.client.get_messages(source_chat_id, ids=message_id)
+            except Exception as e:
+                self.log_error(e)
+                message = None
+            if message is None:
+                logger.error(f"Message of broadcast job {job_id} is gone, cancelling it")
+                self.outbox.finish_job(job_id, CANCELLED)
+                continue
+
+            try:
+                draft = Draft.from_message(message)
+                if message.grouped_id:
+                    # Albums are stored by their first item, fetch the rest too
+                    neighbours = await self.client.get_messages(
+                        source_chat_id, ids=list(range(message_id, message_id + ALBUM_LIMIT))
+                    )
+                    draft = Draft.from_album([m for m in neighbours
+                                              if m and m.grouped_id == message.grouped_id])
+            except TypeError as e:
+                logger.error(f"Message of broadcast job {job_id} can't be posted ({e}), cancelling it")
+                self.outbox.finish_job(job_id, CANCELLED)
+                continue
+
+            async def notify(report, chat_id=source_chat_id):
+                await self.client.send_message(chat_id, report, parse_mode='html')
+
+            logger.info(f"Resuming interrupted broadcast job {job_id}")
+            # Drafts come from private chats, whose id is the user who sent it
+            job = self.start_job(job_id, draft, notify, owner=source_chat_id)
+            await job.task
+
     def setup_handlers(self):
-        """Set up all message handlers"""
-        @self.client.on(events.NewMessage(pattern='/addgroup'))
+        """Set up all message handlers
+
+        Commands share one NewMessage handler that dispatches on the exact
+        command, instead of one regex handler per command.
+        """
+        @self.client.on(events.Raw(types=RIGHTS_UPDATES))
+        async def rights_handler(update):
+            chat_id = getattr(update, 'channel_id', None) or getattr(update, 'chat_id', None)
+            if chat_id is not None:
+                self.admin_cache.pop(chat_id, None)
+
         async def add_group_handler(event):
             try:
                 # Only work in groups, not private chats
@@ -178,7 +460,7 @@ class PostBot:
                     return
 
                 chat = await event.get_chat()
-                if await self.verify_group(chat.id, chat.title):
+                if await self.verify_group(utils.get_peer_id(chat), chat.title):
                     await event.reply(
                         "✅ Successfully added this group!\n"
                         "I'll post messages here when you use /post"
@@ -193,17 +475,13 @@ class PostBot:
                 self.log_error(e)
                 await event.reply("❌ Error adding group. Try again later.")
 
-        @self.client.on(events.NewMessage(pattern='/removegroup'))
         async def remove_group_handler(event):
             try:
                 if not event.is_group and not event.is_channel:
                     await event.reply("❌ This command only works in groups!")
                     return
 
-                chat_id = str(event.chat_id)
-                if chat_id in self.target_groups:
-                    del self.target_groups[chat_id]
-                    self.save_groups()
+                if self.target_groups.remove(event.chat_id):
                     await event.reply("✅ Removed this group from posting list.")
                 else:
                     await event.reply("❌ This group wasn't in my posting list.")
@@ -212,7 +490,6 @@ class PostBot:
                 self.log_error(e)
                 await event.reply("❌ Error removing group.")
 
-        @self.client.on(events.NewMessage(pattern='/start'))
         async def start_handler(event):
             await event.reply(
                 "🌟 <b>Welcome to TELETY!</b> 🌟\n\n"
@@ -220,6 +497,7 @@ class PostBot:
                 "/start - Show this message\n"
                 "/help - Show help information\n"
                 "/post - Start posting process\n"
+                "/status - Show progress of the current broadcast\n"
                 "/groups - List connected groups\n"
                 "/addgroup - Add current group (use in group)\n"
                 "/removegroup - Remove current group (use in group)\n"
@@ -228,7 +506,6 @@ class PostBot:
                 parse_mode='html'
             )
 
-        @self.client.on(events.NewMessage(pattern='/help'))
         async def help_handler(event):
             await event.reply(
                 "📚 <b>TELETY Help Guide</b>\n\n"
@@ -241,7 +518,6 @@ class PostBot:
                 parse_mode='html'
             )
 
-        @self.client.on(events.NewMessage(pattern='/groups'))
         async def groups_handler(event):
             if not self.target_groups:
                 await event.reply(
@@ -252,7 +528,7 @@ class PostBot:
                 
             groups_list = "\n".join([
                 f"📌 {group_name}" 
-                for group_name in self.target_groups.values()
+                for group_name in self.target_groups.titles()
             ])
             
             await event.reply(
@@ -261,19 +537,21 @@ class PostBot:
                 parse_mode='html'
             )
 
-        @self.client.on(events.NewMessage(pattern='/post'))
         async def post_handler(event):
-            if self.is_posting:
-                await event.reply("⚠️ Already posting! Please wait...")
+            if self.active_job:
+                await event.reply("⚠️ Already posting! Use /status to follow it.")
+                return
+            if self.busy:
+                # Between two resumed jobs active_job is briefly empty
+                await event.reply("⏳ Resuming interrupted broadcasts, try /post again shortly.")
                 return
 
-            if not self.stored_message:
+            draft = self.drafts.get(event.sender_id)
+            if not draft:
                 await event.reply("❌ No message stored!\nSend me a message first.")
                 return
 
             try:
-                self.is_posting = True
-                
                 if not self.target_groups:
                     await event.reply(
                         "❌ Not added to any groups!\n"
@@ -281,61 +559,125 @@ class PostBot:
                     )
                     return
 
-                await event.reply(f"🚀 Starting to post to {len(self.target_groups)} groups...")
-                
-                success = 0
-                failed = 0
-
-                for group_id, group_name in self.target_groups.items():
-                    try:
-                        if await self.send_message_to_group(group_id, self.stored_message):
-                            success += 1
-                            logger.info(f"Successfully posted to {group_name}")
-                        else:
-                            failed += 1
-                            logger.error(f"Failed to post to {group_name}")
-                        await asyncio.sleep(2)  # Rate limiting
-                    except Exception as e:
-                        self.log_error(e)
-                        failed += 1
-                        continue
-
-                # Send report
-                total = len(self.target_groups)
-                success_rate = (success / total) * 100 if total > 0 else 0
-                
-                report = (
-                    "📊 <b>Posting Complete!</b>\n\n"
-                    f"✅ Success: {success} groups\n"
-                    f"❌ Failed: {failed} groups\n"
-                    f"📈 Success Rate: {success_rate:.1f}%"
+                self.drafts.pop(event.sender_id)
+                job_id = self.outbox.create_job(
+                    draft.peer, draft.message_id, draft.text,
+                    list(self.target_groups)
+                )
+
+                async def notify(report):
+                    await event.reply(report, parse_mode='html')
+
+                self.start_job(job_id, draft, notify, owner=event.sender_id)
+                await event.reply(
+                    f"🚀 Starting to post to {len(self.target_groups)} groups... (#{job_id})\n"
+                    "Use /status to follow it or /cancel to stop it."
                 )
-                await event.reply(report, parse_mode='html')
 
             except Exception as e:
                 self.log_error(e)
                 await event.reply(f"❌ Error during posting: {str(e)}")
-            finally:
-                self.is_posting = False
-                self.stored_message = None
 
-        @self.client.on(events.NewMessage(pattern='/cancel'))
+        async def status_handler(event):
+            job = self.active_job or self.last_job
+            if not job:
+                await event.reply("💤 No broadcast has run yet.")
+                return
+
+            if job.running:
+                state = "running"
+            else:
+                state = "cancelled" if job.cancelled else "finished"
+            await event.reply(
+                f"📊 <b>Broadcast #{job.job_id}</b> ({state})\n\n"
+                f"✅ Sent: {job.sent}\n"
+                f"⏳ Pending: {job.pending}\n"
+                f"❌ Failed: {job.failed}\n"
+                f"⚡ Speed: {job.throughput():.1f} groups/s",
+                parse_mode='html'
+            )
+
         async def cancel_handler(event):
-            self.stored_message = None
-            self.is_posting = False
+            self.drafts.pop(event.sender_id)
+            job = self.active_job
+            if job and not job.task.done() and job.owner == event.sender_id:
+                job.cancelled = True
+                job.task.cancel()
+                await event.reply(f"🚫 Stopping broadcast #{job.job_id}. Message cleared.")
+                return
             await event.reply("🚫 Operation cancelled. Message cleared.")
 
-        @self.client.on(events.NewMessage)
         async def message_handler(event):
-            if event.message.text and event.message.text.startswith('/'):
-                return  # Skip commands
-                
-            self.stored_message = event.message
+            if not event.is_private or event.message.grouped_id:
+                return  # Drafts come from private chats, albums from album_handler
+
+            try:
+                draft = Draft.from_message(event.message)
+            except TypeError:
+                # Telethon has no input form for some media, e.g. stories
+                await event.reply("❌ This message type can't be posted.")
+                return
+            if draft.empty:
+                await event.reply("❌ This message has nothing I can post.")
+                return
+            self.drafts.put(event.sender_id, draft)
             await event.reply(
                 "✅ Message stored!\n"
                 "Use /post when you're ready to send it."
             )
 
+        self.commands = {
+            '/addgroup': add_group_handler,
+            '/removegroup': remove_group_handler,
+            '/start': start_handler,
+            '/help': help_handler,
+            '/groups': groups_handler,
+            '/post': post_handler,
+            '/status': status_handler,
+            '/cancel': cancel_handler,
+        }
+
+        @self.client.on(events.NewMessage)
+        async def dispatch(event):
+            """Parse the command once and route it with one dict lookup"""
+            text = event.raw_text
+            if not text or not text.startswith('/'):
+                await message_handler(event)  # Fast path for drafts
+                return
+
+            # "/post@MyBot extra" -> "/post"
+            command = text.split(None, 1)[0].split('@', 1)[0].lower()
+            handler = self.commands.get(command)
+            if handler is None:
+                return
+            started = time.perf_counter()
+            try:
+                await handler(event)
+            finally:
+                stats = self.command_stats.get(command)
+                if stats is None:
+                    stats = self.command_stats[command] = CommandStats()
+                stats.record(time.perf_counter() - started)
+
+        @self.client.on(events.Album)
+        async def album_handler(event):
+            if not event.is_private:
+                return
+
+            try:
+                draft = Draft.from_album(event.messages)
+            except TypeError:
+                await event.reply("❌ This message type can't be posted.")
+                return
+            if draft.empty:
+                await event.reply("❌ This album has nothing I can post.")
+                return
+            self.drafts.put(event.sender_id, draft)
+            await event.reply(
+                f"✅ Album of {len(draft.album)} items stored!\n"
+                "Use /post when you're ready to send it."
+            )
+
 def start_post():
     """Main entry point for the bot"""
     if not check_session():
@@ -346,13 +688,11 @@ def start_post():
     clear_screen()
     print_header()
     
-    # Create and get event loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
     post_bot = PostBot()
+    background = []
     
     async def start_bot():
+        current_module.set('post')
         try:
             print("\n🔑 Get your bot token from @BotFather on Telegram")
             bot_token = input("🤖 Enter your bot token: ").strip()
@@ -365,6 +705,11 @@ def start_post():
             print("💡 Press Ctrl+C to stop")
             
             post_bot.setup_handlers()
+            # Answer commands right away, check groups and resume jobs meanwhile
+            background.extend([
+                asyncio.ensure_future(post_bot.verify_saved_groups()),
+                post_bot.start_resume()
+            ])
             await post_bot.client.run_until_disconnected()
                 
         except KeyboardInterrupt:
@@ -373,28 +718,22 @@ def start_post():
             post_bot.log_error(e)
             print(f"\n❌ Error: {str(e)}")
         finally:
+            # Stop this bot's own work; the shared loop keeps running
+            if post_bot.active_job and post_bot.active_job.task:
+                background.append(post_bot.active_job.task)
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
             if post_bot.client:
                 await post_bot.client.disconnect()
 
     try:
-        loop.run_until_complete(start_bot())
+        get_runtime().run(start_bot())
     except KeyboardInterrupt:
         pass
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
     finally:
-        try:
-            # Cancel all running tasks
-            pending = asyncio.all_tasks(loop)
-            for task in pending:
-                task.cancel()
-            
-            # Run loop until tasks are cancelled
-            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-            
-            # Close the loop
-            loop.close()
-        except Exception as e:
-            print(f"\n❌ Error during cleanup: {str(e)}")
-        
         print("\n✨ Bot stopped. Press Enter to return to main menu...")
         input()
 
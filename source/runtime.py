@@ -0,0 +1,103 @@
+import atexit
+import asyncio
+import logging
+from typing import Awaitable, Dict, Optional, TypeVar
+from telethon import TelegramClient
+from session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class Runtime:
+    """One event loop and one connected client per session for the whole process
+
+    Menu actions run on ``loop`` through ``run`` and borrow their client
+    with ``client``, so only the first action on a session pays for the
+    connection and the session file load. Clients stay connected between
+    actions and are closed by ``close`` when the process exits.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.clients: Dict[str, TelegramClient] = {}
+        self.session_mgr = SessionManager()
+        self.closed = False
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a menu action to completion on the shared loop"""
+        task = self.loop.create_task(coro)
+        try:
+            return self.loop.run_until_complete(task)
+        except KeyboardInterrupt:
+            # Let the action clean up before returning to the menu
+            task.cancel()
+            self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            raise
+
+    async def client(self, session_name: str) -> Optional[TelegramClient]:
+        """Connected, authorized client for a session, reconnecting if needed"""
+        client = self.clients.get(session_name)
+        if client is not None:
+            if client.is_connected():
+                return client
+            try:
+                await client.connect()
+                if await client.is_user_authorized():
+                    return client
+            except Exception as e:
+                logger.warning(f"Reconnecting {session_name} failed: {e}")
+            await self.release(session_name)
+
+        client = await self.session_mgr.get_client(session_name)
+        if client is not None:
+            self.clients[session_name] = client
+        return client
+
+    async def release(self, session_name: str) -> None:
+        """Disconnect a session's client and forget it"""
+        client = self.clients.pop(session_name, None)
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception as e:
+                logger.warning(f"Disconnecting {session_name} failed: {e}")
+
+    def release_all(self) -> None:
+        """Disconnect every client, e.g. after logging out"""
+        for session_name in list(self.clients):
+            self.loop.run_until_complete(self.release(session_name))
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.release_all()
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+
+
+_runtime: Optional[Runtime] = None
+
+
+def get_runtime() -> Runtime:
+    """The process-wide runtime, created on first use"""
+    global _runtime
+    if _runtime is None or _runtime.closed:
+        _runtime = Runtime()
+        atexit.register(_runtime.close)
+    return _runtime
+
+
+def close_runtime() -> None:
+    """Close the runtime if one was started"""
+    if _runtime is not None:
+        _runtime.close()
@@ -6,16 +6,27 @@ from datetime import datetime
 from telethon import TelegramClient, errors
 from telethon.tl.functions.channels import GetParticipantsRequest
 from telethon.tl.types import ChannelParticipantsSearch
+from telethon.tl.types.channels import ChannelParticipantsNotModified
 from telethon.tl.functions.messages import GetDialogsRequest
 from telethon.tl.types import InputPeerEmpty, Channel, Chat
 from telethon.tl.functions.messages import GetFullChatRequest
 import asyncio
-from typing import Tuple, List
+from typing import Callable, Dict, Tuple, List, Optional
 from login import check_session, print_header, clear_screen
+from export import UserExportWriter
+from checkpoint import ScrapeCheckpoint
+from pacer import get_pacer
+from member_store import MemberStore, MEMBER_DB
+from runtime import get_runtime
+import log_writer
+from metrics import current_module
 
 # Constants
 BATCH_SIZE = 200
-DELAY = 2  # seconds between batches
+DELAY = 2  # starting seconds between batches, adapted by the pacer
+MIN_DELAY = 0.5  # never page faster than this
+PACE_METHOD = 'GetParticipantsRequest'
+MAX_PARALLEL_GROUPS = 4  # groups scraped at once in batch mode
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -32,115 +43,200 @@ def print_header():
     print(header)
     print("\033[35m" + "=" * 50 + "\033[0m")
 
-def log_error(error: Exception, module: str = 'scrape') -> None:
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open("errors.txt", "a") as f:
-        f.write(f"[{timestamp}] {str(error)}\n")
+def log_error(error: Exception, module: str = 'scrape', target: str = None) -> None:
+    log_writer.log_error(error, module, target)
 
-async def scrape_users(client: TelegramClient, group: str) -> None:
+async def resolve_group(client: TelegramClient, group: str):
+    """Resolve a group link/ID, returns (entity, group_name) or (None, None)"""
+    # Get entity with better error handling
     try:
-        # Get entity with better error handling
-        try:
-            if group.isdigit() or (group.startswith('-') and group[1:].isdigit()):
-                entity = await client.get_entity(int(group))
-            else:
-                entity = await client.get_entity(group)
+        if group.isdigit() or (group.startswith('-') and group[1:].isdigit()):
+            entity = await client.get_entity(int(group))
+        else:
+            entity = await client.get_entity(group)
 
-            # Safer group name extraction
-            if hasattr(entity, 'username') and entity.username:
-                group_name = entity.username
-            else:
-                group_name = str(entity.id)
+        # Safer group name extraction
+        if hasattr(entity, 'username') and entity.username:
+            group_name = entity.username
+        else:
+            group_name = str(entity.id)
+        return entity, group_name
 
-        except ValueError:
-            print("\n❌ Error: Group not found. Make sure the link/ID is correct.")
-            return
+    except ValueError:
+        print("\n❌ Error: Group not found. Make sure the link/ID is correct.")
+    except errors.FloodWaitError as e:
+        print(f"\n⚠️ Rate limit hit. Please wait {e.seconds} seconds")
+        log_error(e)
+    return None, None
+
+async def iter_participant_pages(client: TelegramClient, entity, offset: int = 0,
+                                 page_hashes: Optional[Dict[int, int]] = None,
+                                 cached_ids: Optional[Callable[[int], List[int]]] = None,
+                                 on_retry: Optional[Callable[[Exception], None]] = None):
+    """Yield (users, user_ids) for each paced GetParticipants page
+
+    With ``page_hashes`` every page is requested with the hash stored for
+    its offset; a page that did not change is yielded with ``users`` None
+    and the ids ``cached_ids(offset)`` returns for it. FloodWaits are slept
+    through the pacer; other errors are retried after DELAY when
+    ``on_retry`` is given, which is told about every retry. Admin and
+    private-group errors always propagate.
+    """
+    pacer = get_pacer()
+    pacer.configure(PACE_METHOD, DELAY, min_delay=MIN_DELAY)
+    while True:
+        try:
+            await pacer.wait(PACE_METHOD)
+            result = await client(GetParticipantsRequest(
+                channel=entity,
+                filter=ChannelParticipantsSearch(''),
+                offset=offset,
+                limit=BATCH_SIZE,
+                hash=page_hashes.get(offset, 0) if page_hashes else 0
+            ))
+            pacer.success(PACE_METHOD)
         except errors.FloodWaitError as e:
-            print(f"\n⚠️ Rate limit hit. Please wait {e.seconds} seconds")
-            log_error(e)
+            if on_retry:
+                on_retry(e)
+            await pacer.flood_wait(PACE_METHOD, e.seconds)
+            continue
+        except (errors.ChatAdminRequiredError, errors.ChannelPrivateError):
+            raise
+        except Exception as e:
+            if on_retry is None:
+                raise
+            on_retry(e)
+            await asyncio.sleep(DELAY)
+            continue
+
+        if isinstance(result, ChannelParticipantsNotModified):
+            users, user_ids = None, cached_ids(offset)
+        else:
+            users, user_ids = result.users, [user.id for user in result.users]
+        yield users, user_ids
+        offset += len(user_ids)
+        if len(user_ids) < BATCH_SIZE:
+            break
+
+async def iter_participant_batches(client: TelegramClient, entity, offset: int = 0,
+                                   on_retry: Optional[Callable[[Exception], None]] = None):
+    """Yield GetParticipants pages of users, paced like scrape_users"""
+    async for users, _ in iter_participant_pages(client, entity, offset, on_retry=on_retry):
+        yield users
+
+async def scrape_users(client: TelegramClient, group: str,
+                       session_name: str = 'scraper_session', resume: bool = False,
+                       store: Optional[MemberStore] = None,
+                       progress: Optional['ScrapeProgress'] = None) -> None:
+    # Batch scrapes report through their progress record instead of the console
+    say = progress.log if progress else print
+    try:
+        entity, group_name = await resolve_group(client, group)
+        if not entity:
+            if progress:
+                progress.finish('failed', error="group not found")
             return
+        if progress:
+            progress.group_name = group_name
+
+        if store:
+            store.upsert_group(entity)
+
+        checkpoint = ScrapeCheckpoint(session_name, group_name)
+        resumable = resume and checkpoint.load()
+        if resumable and not UserExportWriter(checkpoint.filename).can_resume(checkpoint.spool_size):
+            say("\n⚠️ Saved progress is incomplete on disk, starting over")
+            resumable = False
+        if resumable:
+            # Continue from the last committed batch
+            filename = checkpoint.filename
+            writer = UserExportWriter(filename).open(resume_size=checkpoint.spool_size)
+            writer.written = checkpoint.written
+            writer.batches = checkpoint.batches
+            offset = checkpoint.offset
+            total_attempts = checkpoint.total_attempts
+            failed_attempts = checkpoint.failed_attempts
+            say(f"\n♻️ Resuming from offset {offset} ({writer.written} usernames saved)")
+        else:
+            # Starting over makes any older partial scrape of this group stale
+            if checkpoint.load() and checkpoint.filename:
+                UserExportWriter(checkpoint.filename).discard()
+
+            # Stream batches straight to disk instead of holding them in memory
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"users_{group_name}_{timestamp}.txt"
+            writer = UserExportWriter(filename).open()
+            offset = 0
+            total_attempts = 0
+            failed_attempts = 0
+            checkpoint.group = group
+            checkpoint.commit(filename=filename, offset=0, batches=0, written=0,
+                              spool_size=0, total_attempts=0, failed_attempts=0)
+
+        def on_retry(error: Exception) -> None:
+            nonlocal failed_attempts
+            failed_attempts += 1
+            if isinstance(error, errors.FloodWaitError):
+                say(f"\n⚠️ Rate limit hit. Waiting {error.seconds} seconds...")
+            else:
+                say(f"\n❌ Error during scraping: {str(error)}")
+                log_error(error, target=group)
 
-        users = set()
-        offset = 0
-        total_attempts = 0
-        failed_attempts = 0
-        last_batch_size = BATCH_SIZE
-
-        print("\n🔍 Scraping users...")
-        print("📊 Progress: ", end="", flush=True)
-
-        while last_batch_size == BATCH_SIZE:
-            try:
-                # Get participants
-                result = await client(GetParticipantsRequest(
-                    channel=entity,
-                    filter=ChannelParticipantsSearch(''),
-                    offset=offset,
-                    limit=BATCH_SIZE,
-                    hash=0
-                ))
+        say("\n🔍 Scraping users...")
+        say("📊 Progress: ", end="", flush=True)
 
+        try:
+            async for users in iter_participant_batches(client, entity, offset, on_retry):
                 # Process users from this batch
-                for user in result.users:
-                    if user.username:  # Only store users with usernames
-                        users.add(user.username)
+                writer.write_batch(
+                    user.username for user in users
+                    if user.username  # Only store users with usernames
+                )
+                if store:
+                    store.add_batch(entity.id, users)
+                    store.save_page(entity.id, offset, [user.id for user in users])
 
                 # Update progress
-                last_batch_size = len(result.users)
-                offset += last_batch_size
+                offset += len(users)
                 total_attempts += 1
-                print(".", end="", flush=True)
+                checkpoint.commit(
+                    offset=offset,
+                    batches=writer.batches,
+                    written=writer.written,
+                    spool_size=writer.size,
+                    total_attempts=total_attempts,
+                    failed_attempts=failed_attempts
+                )
+                say(".", end="", flush=True)
+                if progress:
+                    progress.update(writer.written, total_attempts, failed_attempts)
 
                 # Show periodic stats
                 if total_attempts % 5 == 0:
-                    print(f"\n📊 Found {len(users)} unique users so far...")
+                    say(f"\n📊 Collected {writer.written} usernames so far...")
 
-                # Break if no more users
-                if last_batch_size < BATCH_SIZE:
-                    break
+        except errors.ChatAdminRequiredError:
+            say("\n❌ Error: Admin privileges required to scrape this group")
+            log_error("Admin privileges required", target=group)
 
-                # Delay to respect rate limits
-                await asyncio.sleep(DELAY)
+        except errors.ChannelPrivateError:
+            say("\n❌ Error: This is a private channel/group")
+            log_error("Private channel/group", target=group)
 
-            except errors.FloodWaitError as e:
-                failed_attempts += 1
-                wait_time = e.seconds
-                print(f"\n⚠️ Rate limit hit. Waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-                continue
-
-            except errors.ChatAdminRequiredError:
-                print("\n❌ Error: Admin privileges required to scrape this group")
-                log_error("Admin privileges required")
-                break
-
-            except errors.ChannelPrivateError:
-                print("\n❌ Error: This is a private channel/group")
-                log_error("Private channel/group")
-                break
-
-            except Exception as e:
-                failed_attempts += 1
-                print(f"\n❌ Error during scraping: {str(e)}")
-                log_error(e)
-                await asyncio.sleep(DELAY)
-                continue
+        get_pacer().save()
 
-        # Save results if we found any users
-        if users:
+        # Build the sorted, de-duplicated file from what was streamed
+        if writer.written:
             try:
-                # Generate filename with group name and timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"users_{group_name}_{timestamp}.txt"
-
-                # Save users to file
-                with open(filename, "w", encoding="utf-8") as f:
-                    for user in sorted(users):  # Sort for readability
-                        f.write(f"{user}\n")
+                unique = writer.finalize()
+                checkpoint.clear()
+                if progress:
+                    progress.finish('done', unique=unique, filename=filename)
+                    return
 
                 # Print final stats
                 print("\n\n✅ Scraping completed!")
-                print(f"👥 Total unique users found: {len(users)}")
+                print(f"👥 Total unique users found: {unique}")
                 print(f"🔄 Total batches attempted: {total_attempts}")
                 print(f"❌ Failed attempts: {failed_attempts}")
                 if total_attempts > 0:
@@ -149,14 +245,174 @@ async def scrape_users(client: TelegramClient, group: str) -> None:
                 print(f"💾 Results saved to: {filename}")
 
             except Exception as e:
-                print("\n❌ Error saving results to file")
+                say("\n❌ Error saving results to file")
                 log_error(e)
-                # If file save fails, print users to console as fallback
-                print("\n👥 Users found:")
-                for user in sorted(users):
-                    print(user)
+                # Nothing is lost: the raw batches stay in the spool file
+                say(f"📁 Unsorted results kept in: {writer.spool_path}")
+                if progress:
+                    progress.finish('failed', error=str(e), filename=writer.spool_path)
         else:
-            print("\n❌ No users found or unable to scrape users from this group")
+            writer.discard()
+            checkpoint.clear()
+            say("\n❌ No users found or unable to scrape users from this group")
+            if progress:
+                progress.finish('empty')
+
+    except Exception as e:
+        say(f"\n❌ Unexpected error: {str(e)}")
+        log_error(e)
+        if progress:
+            progress.finish('failed', error=str(e))
+
+class ScrapeProgress:
+    """Progress and result of one group in a batch scrape"""
+
+    def __init__(self, group: str):
+        self.group = group
+        self.group_name = group
+        self.status = 'pending'
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.unique = None
+        self.filename = None
+        self.error = None
+
+    def log(self, message: str = '', end: str = '\n', flush: bool = False) -> None:
+        """Console output of a batch scrape, one prefixed line per message"""
+        message = message.strip()
+        if message and message != '.' and not message.startswith('📊 Progress'):
+            print(f"[{self.group_name}] {message}", flush=True)
+
+    def update(self, written: int, batches: int, failed: int) -> None:
+        self.status = 'running'
+        self.written = written
+        self.batches = batches
+        self.failed = failed
+
+    def finish(self, status: str, unique: int = None, filename: str = None,
+               error: str = None) -> None:
+        self.status = status
+        self.unique = unique
+        self.filename = filename
+        self.error = error
+
+async def scrape_many(client: TelegramClient, groups: List[str],
+                      session_name: str = 'scraper_session',
+                      store: Optional[MemberStore] = None,
+                      concurrency: int = MAX_PARALLEL_GROUPS) -> List[ScrapeProgress]:
+    """Scrape several groups concurrently on one connected client
+
+    All groups draw from the same pacer budget for GetParticipantsRequest,
+    so the account's total request rate matches a single sequential scrape
+    while resolution, disk writes and FloodWaits of one group overlap the
+    others. Groups with a checkpoint continue where they stopped.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = [ScrapeProgress(group) for group in groups]
+
+    async def run(progress: ScrapeProgress) -> None:
+        async with semaphore:
+            progress.status = 'running'
+            await scrape_users(client, progress.group, session_name, resume=True,
+                               store=store, progress=progress)
+
+    print(f"\n🔍 Scraping {len(groups)} groups ({concurrency} at a time)...")
+    await asyncio.gather(*(run(progress) for progress in results))
+
+    print("\n\n✅ Batch scraping completed!")
+    for progress in results:
+        if progress.status == 'done':
+            print(f"✅ {progress.group_name}: {progress.unique} users → {progress.filename}")
+        elif progress.status == 'empty':
+            print(f"⚠️ {progress.group_name}: no users found")
+        else:
+            print(f"❌ {progress.group_name}: {progress.error or progress.status}")
+    return results
+
+async def rescrape_users(client: TelegramClient, group: str, store: MemberStore) -> None:
+    """Re-scrape a known group and write only who joined and who left
+
+    Each page is requested with the hash of the ids it held last time, so
+    pages that did not change come back as not-modified and cost no data.
+    """
+    try:
+        entity, group_name = await resolve_group(client, group)
+        if not entity:
+            return
+
+        store.upsert_group(entity)
+        has_snapshot = store.has_members(entity.id)
+        page_hashes = store.page_hashes(entity.id)
+        store.begin_snapshot()
+
+        offset = 0
+        total_attempts = 0
+        unchanged_pages = 0
+        failed_attempts = 0
+
+        def on_retry(error: Exception) -> None:
+            nonlocal failed_attempts
+            failed_attempts += 1
+            if isinstance(error, errors.FloodWaitError):
+                print(f"\n⚠️ Rate limit hit. Waiting {error.seconds} seconds...")
+            else:
+                print(f"\n❌ Error during scraping: {str(error)}")
+                log_error(error)
+
+        print("\n🔁 Checking for changes...")
+        print("📊 Progress: ", end="", flush=True)
+
+        try:
+            async for users, user_ids in iter_participant_pages(
+                    client, entity, page_hashes=page_hashes,
+                    cached_ids=lambda page: store.page_ids(entity.id, page),
+                    on_retry=on_retry):
+                if users is None:
+                    unchanged_pages += 1
+                    print("=", end="", flush=True)
+                else:
+                    store.upsert_members(users)
+                    store.save_page(entity.id, offset, user_ids)
+                    print(".", end="", flush=True)
+
+                store.mark_seen(user_ids)
+                offset += len(user_ids)
+                total_attempts += 1
+
+        except (errors.ChatAdminRequiredError, errors.ChannelPrivateError) as e:
+            print(f"\n❌ Error: {str(e)}")
+            log_error(e)
+            return
+
+        get_pacer().save()
+        store.drop_pages_from(entity.id, offset)
+
+        if not has_snapshot:
+            # Nothing to diff against: every member would show up as joined
+            store.apply_snapshot(entity.id, on_join=lambda *_: None, on_leave=lambda *_: None)
+            print("\n\n✅ Re-scrape completed!")
+            print("📸 No previous snapshot, saved this one as the baseline; no delta written")
+            print(f"🔄 Pages requested: {total_attempts} ({unchanged_pages} unchanged)")
+            print(f"❌ Failed attempts: {failed_attempts}")
+            return
+
+        # Diff against the stored snapshot and write the delta
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"delta_{group_name}_{timestamp}.txt"
+        with open(filename, "w", encoding="utf-8") as f:
+            joins, leaves = store.apply_snapshot(
+                entity.id,
+                on_join=lambda user_id, username: f.write(f"+{username or user_id}\n"),
+                on_leave=lambda user_id, username: f.write(f"-{username or user_id}\n")
+            )
+
+        print("\n\n✅ Re-scrape completed!")
+        print(f"➕ Joined: {joins}")
+        print(f"➖ Left: {leaves}")
+        print(f"🔄 Pages requested: {total_attempts} ({unchanged_pages} unchanged)")
+        print(f"❌ Failed attempts: {failed_attempts}")
+        print(f"💾 Changes saved to: {filename}")
 
     except Exception as e:
         print(f"\n❌ Unexpected error: {str(e)}")
@@ -186,27 +442,79 @@ async def get_credentials() -> Tuple[int, str]:
         except ValueError:
             print("❌ Invalid input. Please try again.")
 
-async def get_group_link() -> str:
-    return input("\n🔗 Enter group/channel link or ID: ")
+async def get_group_links() -> List[str]:
+    """Ask for one or more groups: comma separated, or a .txt file with one per line"""
+    value = input("\n🔗 Enter group/channel link or ID (comma separated or a .txt file for several): ").strip()
+    if os.path.isfile(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+        return [line for line in lines if line and not line.startswith('#')]
+    return [group.strip() for group in value.split(',') if group.strip()]
+
+async def run_scrape(client: TelegramClient, groups: List[str], resume: bool,
+                     save_db: Optional[bool] = None, incremental: Optional[bool] = None) -> None:
+    """Scrape the chosen groups, asking for storage options not given"""
+    store = None
+    if save_db is None:
+        save_db = input(f"💾 Also save full member records to {MEMBER_DB}? (y/n): ").strip().lower() == 'y'
+    if save_db:
+        store = MemberStore(MEMBER_DB)
+        if resume:
+            incremental = False
+        elif incremental is None:
+            incremental = input("🔁 Only record joins/leaves since the last scrape? (y/n): ").strip().lower() == 'y'
+    else:
+        incremental = False
+
+    try:
+        if incremental:
+            # Re-scrapes share one snapshot table, so they run in turn
+            for group in groups:
+                await rescrape_users(client, group, store)
+        elif len(groups) > 1:
+            await scrape_many(client, groups, 'scraper_session', store=store)
+        else:
+            await scrape_users(client, groups[0], 'scraper_session', resume=resume, store=store)
+    finally:
+        if store:
+            store.close()
 
 async def main_scrape() -> None:
+    current_module.set('scrape')
     try:
         clear_screen()
         print_header()
         
         print("\n🔄 Starting Telegram session...")
-        session_mgr = SessionManager()
-        client = await session_mgr.get_client('scraper_session')
+        client = await get_runtime().client('scraper_session')
 
         if not client:
             print("\n❌ Failed to initialize session. Please try again.")
             return
             
         print("✅ Successfully connected to Telegram!")
-        group = await get_group_link()
-        await scrape_users(client, group)
 
-        await client.disconnect()
+        # Offer to continue an interrupted scrape before asking for a new one
+        groups = []
+        resume = False
+        pending = ScrapeCheckpoint.pending('scraper_session')
+        if pending:
+            print("\n♻️ Unfinished scrapes found:")
+            for i, checkpoint in enumerate(pending, 1):
+                print(f"{i}. {checkpoint.group_name} - {checkpoint.written} usernames, "
+                      f"offset {checkpoint.offset} ({checkpoint.updated})")
+            choice = input("\n⌨️  Enter number to resume or press Enter for a new scrape: ").strip()
+            if choice.isdigit() and 1 <= int(choice) <= len(pending):
+                groups = [pending[int(choice) - 1].group]
+                resume = True
+
+        if not groups:
+            groups = await get_group_links()
+
+        if groups:
+            await run_scrape(client, groups, resume)
+        else:
+            print("\n❌ No group entered.")
 
     except Exception as e:
         log_error(e)
@@ -222,7 +530,7 @@ def start_scrape() -> None:
     try:
         clear_screen()
         print_header()
-        asyncio.run(main_scrape())
+        get_runtime().run(main_scrape())
     except KeyboardInterrupt:
         print("\n\n👋 Scraping cancelled by user")
     except Exception as e:
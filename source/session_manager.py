@@ -6,6 +6,8 @@ from telethon import TelegramClient
 from telethon.tl.functions.messages import GetDialogsRequest
 from telethon.tl.types import InputPeerEmpty
 from config import API_ID, API_HASH, SCRAPER_SESSION, ADDER_SESSION
+from session_store import BufferedSession
+from metrics import InstrumentedClient
 
 class SessionManager:
     def __init__(self):
@@ -48,7 +50,7 @@ class SessionManager:
     async def get_client(self, session_name: str = 'telety_session') -> Optional[TelegramClient]:
         """Get TelegramClient with QR login if needed"""
         try:
-            client = TelegramClient(session_name, API_ID, API_HASH)
+            client = InstrumentedClient(BufferedSession(session_name), API_ID, API_HASH)
             await client.connect()
             
             if not await client.is_user_authorized():
@@ -56,7 +58,10 @@ class SessionManager:
                 if not await self.generate_qr_login(client):
                     await client.disconnect()
                     return None
-            
+
+            # Scrape and add pace themselves: every FloodWait has to reach
+            # the pacer, not be slept through and passed off as a success
+            client.flood_sleep_threshold = 0
             return client
             
         except Exception as e:
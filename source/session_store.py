@@ -0,0 +1,268 @@
+import os
+import time
+import atexit
+import logging
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+from telethon import utils
+from telethon.sessions import MemorySession, SQLiteSession
+from telethon.tl.types import PeerUser, PeerChat, PeerChannel, InputPeerUser
+from telethon.tl.types.contacts import ResolvedPeer
+
+logger = logging.getLogger(__name__)
+
+# Constants
+ENTITY_DB = 'entities.db'
+FLUSH_INTERVAL = 30  # seconds buffered changes may wait before being written
+SESSION_EXTENSION = '.session'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    account_id INTEGER NOT NULL,
+    id         INTEGER NOT NULL,
+    hash       INTEGER NOT NULL,
+    username   TEXT,
+    phone      TEXT,
+    name       TEXT,
+    PRIMARY KEY (account_id, id)
+) WITHOUT ROWID;
+"""
+
+# (marked id, access hash, username, phone, name), as Telethon's sessions use
+Row = Tuple[int, int, Optional[str], Optional[str], Optional[str]]
+
+
+class AccountEntities:
+    """Entities known to one account, indexed for every session lookup"""
+
+    __slots__ = ('by_id', 'by_username', 'by_phone', 'by_name', 'dirty')
+
+    def __init__(self):
+        self.by_id: Dict[int, Row] = {}
+        self.by_username: Dict[str, int] = {}
+        self.by_phone: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.dirty = set()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def put(self, row: Row, dirty: bool = True) -> None:
+        entity_id = row[0]
+        old = self.by_id.get(entity_id)
+        if old == row:
+            return
+        self.by_id[entity_id] = row
+        for index, position in ((self.by_username, 2), (self.by_phone, 3), (self.by_name, 4)):
+            if old and old[position] and index.get(old[position]) == entity_id:
+                del index[old[position]]
+            if row[position]:
+                index[row[position]] = entity_id
+        if dirty:
+            self.dirty.add(entity_id)
+
+    def lookup(self, index: Dict[str, int], key: str) -> Optional[Tuple[int, int]]:
+        entity_id = index.get(key)
+        return None if entity_id is None else self.by_id[entity_id][:2]
+
+
+class EntityStore:
+    """Entity cache shared by every session of the same account
+
+    Rows live in memory per account and only changed ones are written,
+    in one transaction per flush. Access hashes belong to the account
+    that saw them, so accounts never read each other's rows.
+    """
+
+    def __init__(self, path: str = ENTITY_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.accounts: Dict[int, AccountEntities] = {}
+
+    def account(self, account_id: int) -> AccountEntities:
+        """Entities of an account, loaded from disk on first use"""
+        entities = self.accounts.get(account_id)
+        if entities is None:
+            entities = self.accounts[account_id] = AccountEntities()
+            rows = self.conn.execute(
+                "SELECT id, hash, username, phone, name FROM entities WHERE account_id = ?",
+                (account_id,)
+            )
+            for row in rows:
+                entities.put(row, dirty=False)
+        return entities
+
+    def flush(self) -> int:
+        """Write every changed row, returns how many were written"""
+        rows = []
+        for account_id, entities in self.accounts.items():
+            rows.extend((account_id,) + entities.by_id[entity_id] for entity_id in entities.dirty)
+            entities.dirty.clear()
+        if rows:
+            with self.conn:
+                self.conn.executemany(
+                    """INSERT OR REPLACE INTO entities (account_id, id, hash, username, phone, name)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+        return len(rows)
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+
+_store: Optional[EntityStore] = None
+
+
+def get_entity_store() -> EntityStore:
+    """The process-wide entity store, flushed and closed at exit"""
+    global _store
+    if _store is None:
+        _store = EntityStore()
+        atexit.register(_store.close)
+    return _store
+
+
+class BufferedSession(MemorySession):
+    """Telethon session kept in memory and written behind
+
+    Reads an existing ``.session`` file once and writes it back in one
+    short transaction on ``close``, or on ``save`` once ``flush_interval``
+    has passed, instead of committing on every update. A new auth key or
+    data center is written right away, since losing it means logging in
+    again. Entities go to the shared EntityStore of the logged-in
+    account; the file only keeps the self row that identifies it.
+    """
+
+    def __init__(self, session_id: str, store: EntityStore = None,
+                 flush_interval: float = FLUSH_INTERVAL):
+        super().__init__()
+        self.filename = session_id if session_id.endswith(SESSION_EXTENSION) \
+            else session_id + SESSION_EXTENSION
+        self.store = store or get_entity_store()
+        self.flush_interval = flush_interval
+        self.account_id: Optional[int] = None
+        # Rows seen before we know whose session this is, e.g. during login
+        self.entities = AccountEntities()
+        self._dirty = False
+        self._deleted = False
+        self._flushed = time.monotonic()
+        if os.path.exists(self.filename):
+            self._load()
+        self._saved_auth = self._auth_state()
+
+    def _load(self) -> None:
+        disk = SQLiteSession(self.filename)
+        try:
+            self._dc_id, self._server_address, self._port = \
+                disk.dc_id, disk.server_address, disk.port
+            self._auth_key = disk.auth_key
+            self._takeout_id = disk.takeout_id
+            self._update_states = dict(disk.get_update_states())
+            cursor = disk._cursor()
+            try:
+                rows = cursor.execute("SELECT id, hash, username, phone, name FROM entities")
+                self._add_rows(rows.fetchall(), dirty=True)
+            finally:
+                cursor.close()
+        finally:
+            disk.close()
+        self._dirty = False
+
+    def _add_rows(self, rows: Iterable[Row], dirty: bool = True) -> None:
+        for row in rows:
+            if row[0] == 0:
+                # Telethon stores the logged-in user as id 0, hash = its id
+                self._set_account(row[1])
+            self.entities.put(row, dirty)
+
+    def _set_account(self, account_id: int) -> None:
+        if account_id == self.account_id:
+            return
+        local = self.entities
+        self.account_id = account_id
+        self.entities = self.store.account(account_id)
+        for row in local.by_id.values():
+            self.entities.put(row)
+        self._dirty = True
+
+    # --- connection state -------------------------------------------------
+
+    def _auth_state(self) -> tuple:
+        # Compared by value: Telethon may change the AuthKey object in place
+        key = self._auth_key.key if self._auth_key else None
+        return self._dc_id, self._server_address, self._port, key, self._takeout_id
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty = True
+
+    # --- entities ---------------------------------------------------------
+
+    def process_entities(self, tlo):
+        self._add_rows(self._entities_to_rows(tlo))
+
+    def get_entity_rows_by_phone(self, phone):
+        return self.entities.lookup(self.entities.by_phone, phone)
+
+    def get_entity_rows_by_username(self, username):
+        return self.entities.lookup(self.entities.by_username, username)
+
+    def get_entity_rows_by_name(self, name):
+        return self.entities.lookup(self.entities.by_name, name)
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        ids = (id,) if exact else (utils.get_peer_id(PeerUser(id)),
+                                   utils.get_peer_id(PeerChat(id)),
+                                   utils.get_peer_id(PeerChannel(id)))
+        for entity_id in ids:
+            row = self.entities.by_id.get(entity_id)
+            if row is not None:
+                return row[:2]
+
+    # --- persistence ------------------------------------------------------
+
+    def save(self):
+        """Called by Telethon after changes; only writes what cannot wait"""
+        if self._auth_state() != self._saved_auth \
+                or time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._flushed = time.monotonic()
+        self.store.flush()
+        auth = self._auth_state()
+        if self._deleted or not (self._dirty or auth != self._saved_auth):
+            return
+        disk = SQLiteSession(self.filename)
+        try:
+            disk.set_dc(self._dc_id, self._server_address, self._port)
+            disk.auth_key = self._auth_key
+            disk.takeout_id = self._takeout_id
+            for entity_id, state in self._update_states.items():
+                disk.set_update_state(entity_id, state)
+            if self.account_id:
+                disk.process_entities(ResolvedPeer(None, [InputPeerUser(0, self.account_id)], []))
+            disk.save()
+        except sqlite3.Error as e:
+            # Keep the changes buffered and try again on the next flush
+            logger.warning(f"Saving session {self.filename} failed: {e}")
+            return
+        finally:
+            disk.close()
+        self._dirty = False
+        self._saved_auth = auth
+
+    def close(self):
+        self.flush()
+
+    def delete(self):
+        self._deleted = True
+        try:
+            os.remove(self.filename)
+            return True
+        except OSError:
+            return False